@@ -2,6 +2,11 @@ from .model.base_model import Model
 from .model.base_model import AuditModel
 from .model.measurement_model import MeasurementModel
 from .model.measurement_model import MeasurementTypeModel
+from .model.measurement_model import LatestMeasurementModel
+from .model.measurement_model import MeasurementRollupModel
+from .model.measurement_model import MinuteRollupModel
+from .model.measurement_model import HourRollupModel
+from .model.measurement_model import DayRollupModel
 from .model.device_model import DeviceModel
 from .model.device_model import DeviceGroupModel
 from .model.device_model import DeviceTypeModel
@@ -12,14 +17,9 @@ from .service.device_service import DeviceGroupService
 from .service.device_service import DeviceTypeService
 from .service.measurement_service import MeasurementService
 from .service.measurement_service import MeasurementTypeService
+from .service.measurement_service import LatestMeasurementService
+from .service.measurement_service import MeasurementRollupService
 
 from .common.config import *
 from .common.errors import *
 from .common.util import *
-
-# Create tables
-create_table(MeasurementModel)
-create_table(MeasurementTypeModel)
-create_table(DeviceModel)
-create_table(DeviceGroupModel)
-create_table(DeviceTypeModel)
@@ -0,0 +1,50 @@
+"""
+Archive measurements of all devices to gzip JSONL or Parquet files, one file per hour, before they expire
+(see MEASUREMENT_RETENTION_DAYS). By default measurements from previous day (UTC) are archived, e.g.:
+python archive_measurements.py s3://bucket/measurements --format parquet --expiring-within-days 7
+"""
+import argparse
+import datetime
+import logging
+import time
+
+from service.archive_service import MeasurementArchiveService, ARCHIVE_FORMATS
+
+
+def parse_day(value: str) -> datetime.date:
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("DESTINATION", help="Local directory or s3://bucket/prefix")
+    parser.add_argument("--start", type=parse_day, help="First day (UTC) to archive, YYYY-MM-DD")
+    parser.add_argument("--end", type=parse_day, help="Last day (UTC) to archive, YYYY-MM-DD")
+    parser.add_argument("--format", choices=list(ARCHIVE_FORMATS), default="jsonl")
+    parser.add_argument("--expiring-within-days", type=float, default=None, dest="expiring_within_days",
+                        help="Archive only measurements, which expire within given number of days")
+    parser.add_argument("-v", "--verbose", type=str, choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO")
+    return parser.parse_args()
+
+
+def get_day_start_timestamp(day: datetime.date) -> int:
+    """ Returns timestamp (in milliseconds) of the beginning of UTC day """
+    return int(datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(level=args.verbose)
+    yesterday = datetime.datetime.utcnow().date() - datetime.timedelta(days=1)
+    start_day = args.start or yesterday
+    end_day = args.end or start_day
+    expiring_before = None
+    if args.expiring_within_days is not None:
+        expiring_before = int(time.time() + args.expiring_within_days * 24 * 60 * 60)
+    archive_paths = MeasurementArchiveService.archive_time_range(
+        start_timestamp=get_day_start_timestamp(start_day),
+        end_timestamp=get_day_start_timestamp(end_day + datetime.timedelta(days=1)) - 1,
+        destination=args.DESTINATION,
+        fmt=args.format,
+        expiring_before=expiring_before)
+    logging.info(f"Written {len(archive_paths)} archive files")
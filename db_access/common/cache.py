@@ -0,0 +1,109 @@
+import collections
+import logging
+import threading
+import time
+import typing as t
+
+logger = logging.getLogger(__name__)
+
+
+class KnownKeysCache:
+    """
+    Process-level set of keys known to exist in database, used to skip writes which would fail on condition anyway.
+    Whole set is loaded at once with `loader` (e.g. single scan of table) and reloaded when it's older than `ttl` seconds
+    (failed load is logged and not raised, keys known so far are kept until the next reload)
+    """
+
+    def __init__(self, loader: t.Callable[[], t.Iterable[t.Hashable]], ttl: float):
+        self.loader = loader
+        self.ttl = ttl
+        self._keys = set()  # type: t.Set[t.Hashable]
+        self._loaded_at = None  # type: t.Optional[float]
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: t.Hashable) -> bool:
+        self._reload_if_expired()
+        return key in self._keys
+
+    def add(self, key: t.Hashable):
+        with self._lock:
+            self._keys.add(key)
+
+    def clear(self):
+        with self._lock:
+            self._keys = set()
+            self._loaded_at = None
+
+    def _load(self):
+        return set(self.loader())
+
+    def _reload_if_expired(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            try:
+                self._keys = self._load()
+            except Exception as exception:
+                # Cache only saves requests, so without it callers just send them (e.g. conditional writes)
+                logger.warning(f"Cannot load known keys: {exception}")
+            self._loaded_at = time.monotonic()
+
+
+class KnownValuesCache(KnownKeysCache):
+    """ `KnownKeysCache`, which also keeps value of each key, `loader` yields (key, value) pairs """
+
+    def __init__(self, loader: t.Callable[[], t.Iterable[t.Tuple[t.Hashable, t.Any]]], ttl: float):
+        super().__init__(loader=loader, ttl=ttl)
+        self._keys = {}  # type: t.Dict[t.Hashable, t.Any]
+
+    def get(self, key: t.Hashable, default: t.Any = None) -> t.Any:
+        self._reload_if_expired()
+        return self._keys.get(key, default)
+
+    def add(self, key: t.Hashable, value: t.Any = None):
+        with self._lock:
+            self._keys[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._keys = {}
+            self._loaded_at = None
+
+    def _load(self):
+        return dict(self.loader())
+
+
+class RecentKeysCache:
+    """ Process-level, thread-safe set remembering up to `max_size` most recently used keys (LRU) """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._keys = collections.OrderedDict()  # type: t.Dict[t.Hashable, None]
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: t.Hashable) -> bool:
+        with self._lock:
+            if key not in self._keys:
+                return False
+            self._keys.move_to_end(key)
+            return True
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key: t.Hashable):
+        self.update([key])
+
+    def update(self, keys: t.Iterable[t.Hashable]):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key in keys:
+                self._keys[key] = None
+                self._keys.move_to_end(key)
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
@@ -4,5 +4,25 @@ IOT_AWS_REGION = os.environ.get('IOT_AWS_REGION', 'eu-west-2')
 
 DATABASE_PREFIX = os.environ.get('DATABASE_PREFIX', 'db')  # Used in process of DynamoDB generating tables name
 DATABASE_HOST = os.environ.get('DATABASE_HOST', None)  # Add host if want local connection
+# Create missing tables on first use, can be turned off when all tables already exist (e.g. in production)
+CREATE_TABLES = os.environ.get('CREATE_TABLES', 'true').lower() not in ('false', '0', 'no', 'off')
+
+# Settings of DynamoDB client shared by all models of the process
+DATABASE_MAX_POOL_CONNECTIONS = int(os.environ.get('DATABASE_MAX_POOL_CONNECTIONS', 10))  # Kept-alive HTTP connections
+DATABASE_MAX_RETRY_ATTEMPTS = int(os.environ.get('DATABASE_MAX_RETRY_ATTEMPTS', 3))  # Retries of failed requests
+DATABASE_BASE_BACKOFF_MS = int(os.environ.get('DATABASE_BASE_BACKOFF_MS', 25))  # Base of exponential retry backoff
+DATABASE_CONNECT_TIMEOUT = float(os.environ.get('DATABASE_CONNECT_TIMEOUT', 15))  # Seconds
+DATABASE_READ_TIMEOUT = float(os.environ.get('DATABASE_READ_TIMEOUT', 30))  # Seconds
+
+SCAN_WORKERS = int(os.environ.get('SCAN_WORKERS', 4))  # Number of segments scanned at once in parallel scan
+BATCH_WRITE_WORKERS = int(os.environ.get('BATCH_WRITE_WORKERS', 1))  # Number of BatchWriteItem calls sent at once
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get('BATCH_WRITE_MAX_RETRIES', 8))  # Retries of unprocessed items
+KNOWN_KEYS_CACHE_TTL = int(os.environ.get('KNOWN_KEYS_CACHE_TTL', 300))  # Seconds after which known keys are reloaded
+# Number of recently written measurement keys remembered to drop redelivered duplicates, 0 turns it off
+DEDUPLICATION_CACHE_SIZE = int(os.environ.get('DEDUPLICATION_CACHE_SIZE', 50000))
+# Days after which measurements expire, unless set for their measurement type, 0 means they never expire
+MEASUREMENT_RETENTION_DAYS = float(os.environ.get('MEASUREMENT_RETENTION_DAYS', 0))
+ANALYTICS_CACHE_SIZE = int(os.environ.get('ANALYTICS_CACHE_SIZE', 256))  # Series and reports cached by AnalyticsView
+ARCHIVE_S3_ENDPOINT = os.environ.get('ARCHIVE_S3_ENDPOINT', None)  # Endpoint of S3-compatible archive storage
 
 DEBUG = bool(os.environ.get('DEBUG', False))
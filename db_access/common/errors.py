@@ -8,3 +8,9 @@ class ItemNotUnique(IotDbBaseException):
 
 class ItemDoesNotExist(IotDbBaseException):
     pass
+
+
+class BatchWriteError(IotDbBaseException):
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report
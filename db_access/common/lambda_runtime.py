@@ -0,0 +1,43 @@
+"""
+Runtime shared by lambdas. Everything is initialised once, when handler module is loaded (cold start),
+so warm invocations reuse Sentry client and kept-alive DynamoDB connections instead of creating them again.
+Requires sentry_sdk, which is a dependency of lambdas only
+"""
+import logging
+import os
+import typing as t
+
+import sentry_sdk
+
+from common.util import init_connection
+from model.base_model import Model
+
+SENTRY_DSN = os.environ.get('SENTRY')
+MODE = os.environ.get('MODE', 'undefined')
+
+
+def init_sentry():
+    if SENTRY_DSN:
+        sentry_sdk.init(SENTRY_DSN, environment=MODE)
+
+
+def init_connections(*model_classes: t.Type[Model]):
+    """ Create shared DynamoDB client and connections of models up front, so first invocation doesn't pay for it """
+    for model_class in model_classes:
+        try:
+            init_connection(model_class)
+        except Exception as exception:
+            # Connection will be created again by first request, failing invocation instead of cold start
+            logging.warning(f"Cannot initialise connection of {model_class.__name__}: {exception}")
+
+
+def start_invocation(event: t.Any):
+    """ Separate invocation in Sentry, breadcrumbs of previous invocations of warm container are dropped """
+    if not SENTRY_DSN:
+        return
+    with sentry_sdk.configure_scope() as scope:
+        scope.clear_breadcrumbs()
+    sentry_sdk.add_breadcrumb(category='event', data=event if isinstance(event, dict) else {'event': event})
+
+
+init_sentry()
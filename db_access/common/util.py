@@ -1,15 +1,40 @@
+import threading
 import time
 import typing as t
 
+import botocore.client
+import botocore.session
+import pynamodb.exceptions
 import pynamodb.models
 
-from common.config import DATABASE_PREFIX, DEBUG
+from common.config import DATABASE_PREFIX, DEBUG, CREATE_TABLES, DATABASE_MAX_POOL_CONNECTIONS, \
+    DATABASE_MAX_RETRY_ATTEMPTS, DATABASE_BASE_BACKOFF_MS, DATABASE_CONNECT_TIMEOUT, DATABASE_READ_TIMEOUT
+
+TIME_BUCKET_SIZE = 60 * 60 * 1000  # Width of time bucket (in milliseconds) used to index measurements by time
+
+_ready_tables = set()  # Names of tables, which are known to exist in this process
+_tables_in_creation = set()
+_tables_lock = threading.RLock()
+
+_session = None  # Botocore session shared by all models
+_clients = {}  # DynamoDB clients shared by all models, by (region, host)
+_clients_lock = threading.Lock()
 
 
 def get_timestamp() -> int:
     return int(round(time.time() * 1000))
 
 
+def get_time_bucket(timestamp: int or float) -> int:
+    """ Returns number of time bucket (hour since epoch), which contains given timestamp (in milliseconds) """
+    return int(timestamp // TIME_BUCKET_SIZE)
+
+
+def get_time_buckets(start_timestamp: int or float, end_timestamp: int or float) -> t.List[int]:
+    """ Returns ordered list of time buckets covering given time range (both ends inclusive) """
+    return list(range(get_time_bucket(start_timestamp), get_time_bucket(end_timestamp) + 1))
+
+
 def generate_table_name(basename: str) -> str:
     table_name = f"{DATABASE_PREFIX}_{basename}"
     if DEBUG:
@@ -22,6 +47,75 @@ def generate_label(name: str) -> str:
     return " ".join([s.capitalize() for s in name.split("_")])
 
 
+def init_connection(model_class: t.Type[pynamodb.models.Model]):
+    """
+    Create DynamoDB client of model up front, botocore doesn't allow to create it safely from multiple threads.
+    Table isn't checked here, it's still checked (see `ensure_table`) lazily by the first request of model
+    """
+    model_class._get_connection(ensure_table_exists=False).connection.client
+
+
+def get_client(region: str, host: str = None):
+    """
+    Returns DynamoDB client for given region and host, created only once per process, so its
+    kept-alive HTTP connections are reused by all models and by following lambda invocations
+    """
+    global _session
+    key = (region, host)
+    if key not in _clients:
+        # botocore doesn't allow to create clients safely from multiple threads
+        with _clients_lock:
+            if key not in _clients:
+                if _session is None:
+                    _session = botocore.session.get_session()
+                config = botocore.client.Config(
+                    parameter_validation=False,
+                    connect_timeout=DATABASE_CONNECT_TIMEOUT,
+                    read_timeout=DATABASE_READ_TIMEOUT,
+                    max_pool_connections=DATABASE_MAX_POOL_CONNECTIONS)
+                _clients[key] = _session.create_client('dynamodb', region, endpoint_url=host, config=config)
+    return _clients[key]
+
+
+def configure_connection(model_class: t.Type[pynamodb.models.Model]):
+    """ Apply connection settings from config to model, must be called before its connection is created """
+    model_class.Meta.max_retry_attempts = DATABASE_MAX_RETRY_ATTEMPTS
+    model_class.Meta.base_backoff_ms = DATABASE_BASE_BACKOFF_MS
+    model_class.Meta.connect_timeout_seconds = DATABASE_CONNECT_TIMEOUT
+    model_class.Meta.read_timeout_seconds = DATABASE_READ_TIMEOUT
+    model_class.Meta.max_pool_connections = DATABASE_MAX_POOL_CONNECTIONS
+
+
 def create_table(model_class: t.Type[pynamodb.models.Model]):
+    if model_class.exists():
+        return
     model_class.Meta.billing_mode = 'PAY_PER_REQUEST'  # Enables on demand capacity
-    model_class.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
\ No newline at end of file
+    model_class.create_table(wait=True, read_capacity_units=1, write_capacity_units=1)
+    # Time to live is enabled only for table created here, so existing tables don't pay for it on every start
+    ttl_attribute_name = getattr(model_class.Meta, 'ttl_attribute_name', None)
+    if ttl_attribute_name:
+        try:
+            model_class._get_connection().update_time_to_live(ttl_attribute_name)
+        except pynamodb.exceptions.TableError:
+            # Time to live is not supported (e.g. by dynalite)
+            pass
+
+
+def ensure_table(model_class: t.Type[pynamodb.models.Model]):
+    """
+    Create table of model if it doesn't exist yet. Table is checked only once per process,
+    and not at all if CREATE_TABLES is turned off
+    """
+    table_name = model_class.Meta.table_name
+    if not CREATE_TABLES or table_name in _ready_tables:
+        return
+    with _tables_lock:
+        # Table creation uses model connection itself, so nested call from the same thread has to be skipped
+        if table_name in _ready_tables or table_name in _tables_in_creation:
+            return
+        _tables_in_creation.add(table_name)
+        try:
+            create_table(model_class)
+            _ready_tables.add(table_name)
+        finally:
+            _tables_in_creation.discard(table_name)
@@ -3,21 +3,33 @@ import typing as t
 import pynamodb.models
 import pynamodb.attributes as attributes
 
-from common.util import get_timestamp
+from common.util import get_timestamp, ensure_table, configure_connection, get_client
 
 
 class Model(pynamodb.models.Model):
     class Meta:
         abstract = True
 
+    @classmethod
+    def _get_connection(cls, ensure_table_exists: bool = True):
+        if cls._connection is None:
+            # All models share the same client instead of creating their own one with default settings
+            configure_connection(cls)
+            connection = super()._get_connection().connection
+            connection._client = get_client(connection.region, connection.host)
+        # Every request to DynamoDB goes through the connection, so table is created lazily before the first one
+        if ensure_table_exists:
+            ensure_table(cls)
+        return super()._get_connection()
+
 
 class AuditModel(Model):
     class Meta:
         abstract = True
 
     is_removed = attributes.BooleanAttribute(default=False)
-    created_at = attributes.NumberAttribute(default=get_timestamp())
-    modified_at = attributes.NumberAttribute(default=get_timestamp())
+    created_at = attributes.NumberAttribute(default=get_timestamp)
+    modified_at = attributes.NumberAttribute(default=get_timestamp)
 
     def save(self, condition=None) -> t.Dict[str, t.Any]:
         self.modified_at = get_timestamp()
@@ -3,7 +3,7 @@ import typing as t
 from pynamodb.attributes import UnicodeAttribute, JSONAttribute
 
 from common.config import IOT_AWS_REGION, DATABASE_HOST
-from common.util import generate_table_name, create_table
+from common.util import generate_table_name
 from model.base_model import AuditModel
 
 
@@ -1,7 +1,8 @@
 from pynamodb.attributes import UnicodeAttribute, NumberAttribute
+from pynamodb.indexes import GlobalSecondaryIndex, AllProjection
 
 from common.config import IOT_AWS_REGION, DATABASE_HOST
-from common.util import generate_table_name, create_table
+from common.util import generate_table_name, get_time_bucket
 from model.base_model import AuditModel, Model
 
 
@@ -16,6 +17,19 @@ class MeasurementTypeModel(AuditModel):
     unit = UnicodeAttribute(default="", null=True)
     description = UnicodeAttribute(null=True)
     priority = NumberAttribute(null=True, default=0)
+    retention_days = NumberAttribute(null=True)  # Measurements expire after it, MEASUREMENT_RETENTION_DAYS if not set
+
+
+class MeasurementTimeBucketIndex(GlobalSecondaryIndex):
+    """ Index allowing to query measurements of all devices from selected time bucket (see `get_time_bucket`) """
+    class Meta:
+        index_name = "time_bucket-timestamp-index"
+        projection = AllProjection()
+        read_capacity_units = 1
+        write_capacity_units = 1
+
+    time_bucket = NumberAttribute(hash_key=True)
+    timestamp = NumberAttribute(range_key=True)
 
 
 class MeasurementModel(Model):
@@ -23,8 +37,96 @@ class MeasurementModel(Model):
         table_name = generate_table_name("iot_measurements")
         region = IOT_AWS_REGION
         host = DATABASE_HOST
+        ttl_attribute_name = "expires_at"  # Enabled as time to live of table, when it is created
 
     device_id = UnicodeAttribute(hash_key=True)
     timestamp = NumberAttribute(range_key=True)
     measurement_type = UnicodeAttribute()
     value = NumberAttribute()
+    time_bucket = NumberAttribute(null=True)
+    expires_at = NumberAttribute(null=True)  # Unix time (in seconds) after which DynamoDB deletes measurement
+
+    time_bucket_index = MeasurementTimeBucketIndex()
+
+    def __init__(self, hash_key=None, range_key=None, _user_instantiated=True, **attributes):
+        super().__init__(hash_key, range_key, _user_instantiated, **attributes)
+        # Time bucket is always derived from timestamp, so it doesn't need to be provided explicitly
+        if self.time_bucket is None and self.timestamp is not None:
+            self.time_bucket = get_time_bucket(self.timestamp)
+
+
+class LatestMeasurementModel(Model):
+    """ Projection of iot_measurements, holding only the newest measurement of each type for every device """
+    class Meta:
+        table_name = generate_table_name("iot_latest_measurements")
+        region = IOT_AWS_REGION
+        host = DATABASE_HOST
+
+    device_id = UnicodeAttribute(hash_key=True)
+    measurement_type = UnicodeAttribute(range_key=True)
+    timestamp = NumberAttribute()
+    value = NumberAttribute()
+
+
+class MeasurementRollupModel(Model):
+    """
+    Aggregate of measurements of single type of device from single time bucket of `bucket_size` milliseconds.
+    Rollups are updated during ingestion (see `MeasurementRollupService`), so long time ranges can be read
+    without reading raw measurements
+    """
+    class Meta:
+        abstract = True
+
+    bucket_size = None  # type: int
+
+    device_id = UnicodeAttribute(hash_key=True)
+    bucket_key = UnicodeAttribute(range_key=True)  # Start of bucket and measurement type, see `get_bucket_key`
+    measurement_type = UnicodeAttribute()
+    timestamp = NumberAttribute()  # Start of bucket
+    measurements_count = NumberAttribute(default=0)
+    values_sum = NumberAttribute(default=0)
+    min_value = NumberAttribute(null=True)
+    max_value = NumberAttribute(null=True)
+    last_value = NumberAttribute(null=True)
+    last_timestamp = NumberAttribute(null=True)
+
+    @classmethod
+    def get_bucket_timestamp(cls, timestamp: int or float) -> int:
+        return int(timestamp - timestamp % cls.bucket_size)
+
+    @staticmethod
+    def get_bucket_key(bucket_timestamp: int, measurement_type: str) -> str:
+        # Timestamp is zero-padded, so keys are sorted by time and range of buckets can be queried with `between`
+        return f"{bucket_timestamp:015d}#{measurement_type}"
+
+    @property
+    def value(self) -> float:
+        """ Average of measurements, so rollup can be used in place of single measurement """
+        return self.values_sum / self.measurements_count if self.measurements_count else None
+
+
+class MinuteRollupModel(MeasurementRollupModel):
+    class Meta:
+        table_name = generate_table_name("iot_measurement_rollups_minute")
+        region = IOT_AWS_REGION
+        host = DATABASE_HOST
+
+    bucket_size = 60 * 1000
+
+
+class HourRollupModel(MeasurementRollupModel):
+    class Meta:
+        table_name = generate_table_name("iot_measurement_rollups_hour")
+        region = IOT_AWS_REGION
+        host = DATABASE_HOST
+
+    bucket_size = 60 * 60 * 1000
+
+
+class DayRollupModel(MeasurementRollupModel):
+    class Meta:
+        table_name = generate_table_name("iot_measurement_rollups_day")
+        region = IOT_AWS_REGION
+        host = DATABASE_HOST
+
+    bucket_size = 24 * 60 * 60 * 1000
@@ -0,0 +1,150 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import shutil
+import tempfile
+import typing as t
+
+import botocore.session
+
+from common.config import IOT_AWS_REGION, ARCHIVE_S3_ENDPOINT
+from common.util import get_time_buckets, TIME_BUCKET_SIZE
+from model.measurement_model import MeasurementModel
+from service.measurement_service import MeasurementService
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet is optional, gzip JSONL archives don't need it
+    pyarrow = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = {'jsonl': '.jsonl.gz', 'parquet': '.parquet'}  # Format and extension of archive files
+ARCHIVED_FIELDS = ('device_id', 'measurement_type', 'timestamp', 'value', 'expires_at')
+PARQUET_ROW_GROUP_SIZE = 50000
+
+
+class JsonLinesArchiveWriter:
+    """ Writes measurements as gzip compressed JSON lines, one measurement per line """
+
+    def __init__(self, path: str):
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+
+    def write(self, measurement: MeasurementModel):
+        row = {field: getattr(measurement, field) for field in ARCHIVED_FIELDS}
+        self._file.write(json.dumps(row, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetArchiveWriter:
+    """ Writes measurements as Parquet file, columns are buffered and written in row groups """
+
+    def __init__(self, path: str):
+        if pyarrow is None:
+            raise ImportError("Parquet archives require pyarrow, install it or use 'jsonl' format")
+        self._schema = pyarrow.schema([
+            ('device_id', pyarrow.string()),
+            ('measurement_type', pyarrow.string()),
+            ('timestamp', pyarrow.int64()),
+            ('value', pyarrow.float64()),
+            ('expires_at', pyarrow.int64()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression='zstd')
+        self._columns = {field: [] for field in ARCHIVED_FIELDS}
+
+    def write(self, measurement: MeasurementModel):
+        for field, column in self._columns.items():
+            column.append(getattr(measurement, field))
+        if len(self._columns['timestamp']) >= PARQUET_ROW_GROUP_SIZE:
+            self._write_row_group()
+
+    def close(self):
+        if self._columns['timestamp']:
+            self._write_row_group()
+        self._writer.close()
+
+    def _write_row_group(self):
+        self._writer.write_table(pyarrow.Table.from_pydict(self._columns, schema=self._schema))
+        self._columns = {field: [] for field in ARCHIVED_FIELDS}
+
+
+class MeasurementArchiveService:
+    """
+    Archives measurements of all devices into compressed files, one file per time bucket (hour),
+    so they are kept after they expire from iot_measurements (see `MeasurementModel.expires_at`)
+    """
+    writer_classes = {'jsonl': JsonLinesArchiveWriter, 'parquet': ParquetArchiveWriter}
+
+    @classmethod
+    def archive_time_range(cls, start_timestamp: int, end_timestamp: int, destination: str, fmt: str = 'jsonl',
+                           expiring_before: int = None) -> t.List[str]:
+        """
+        Stream measurements from time range (both ends inclusive) into `<destination>/<YYYY>/<MM>/<DD>/<HH>`
+        files in `fmt` format. Destination is local directory or `s3://bucket/prefix` of S3-compatible store
+        (see ARCHIVE_S3_ENDPOINT). With `expiring_before` (Unix time in seconds) only measurements, which
+        expire before it, are archived. Returns paths of written files, empty time buckets are skipped
+        """
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unknown archive format: {fmt}, supported ones are: {', '.join(ARCHIVE_FORMATS)}")
+        filter_condition = MeasurementModel.expires_at < expiring_before if expiring_before else None
+        archive_paths = []
+        for time_bucket in get_time_buckets(start_timestamp, end_timestamp):
+            # Single time bucket is read with single query of time index
+            measurements = MeasurementService.iter_measurements_for_time_range(
+                max(start_timestamp, time_bucket * TIME_BUCKET_SIZE),
+                min(end_timestamp, (time_bucket + 1) * TIME_BUCKET_SIZE - 1),
+                filter_condition=filter_condition)
+            archive_path = cls.archive_measurements(measurements, destination, cls.get_archive_name(time_bucket, fmt),
+                                                    fmt)
+            if archive_path:
+                archive_paths.append(archive_path)
+        return archive_paths
+
+    @staticmethod
+    def get_archive_name(time_bucket: int, fmt: str) -> str:
+        bucket_start = datetime.datetime.utcfromtimestamp(time_bucket * TIME_BUCKET_SIZE / 1000)
+        return bucket_start.strftime('%Y/%m/%d/%H') + ARCHIVE_FORMATS[fmt]
+
+    @classmethod
+    def archive_measurements(cls, measurements: t.Iterable[MeasurementModel], destination: str, name: str,
+                             fmt: str = 'jsonl') -> t.Optional[str]:
+        """ Write measurements into archive file `name` in destination, returns its path or None if there were none """
+        file_descriptor, temporary_path = tempfile.mkstemp(suffix=ARCHIVE_FORMATS[fmt])
+        os.close(file_descriptor)
+        try:
+            written_count = 0
+            writer = cls.writer_classes[fmt](temporary_path)
+            try:
+                for measurement in measurements:
+                    writer.write(measurement)
+                    written_count += 1
+            finally:
+                writer.close()
+            if not written_count:
+                return None
+            archive_path = cls._store(temporary_path, destination, name)
+            logger.info(f"Archived {written_count} measurements to {archive_path}")
+            return archive_path
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    @staticmethod
+    def _store(path: str, destination: str, name: str) -> str:
+        if destination.startswith('s3://'):
+            bucket, _, prefix = destination[len('s3://'):].partition('/')
+            key = '/'.join(part for part in (prefix.strip('/'), name) if part)
+            client = botocore.session.get_session().create_client('s3', IOT_AWS_REGION,
+                                                                   endpoint_url=ARCHIVE_S3_ENDPOINT)
+            with open(path, 'rb') as archive_file:
+                client.put_object(Bucket=bucket, Key=key, Body=archive_file)
+            return f's3://{bucket}/{key}'
+        archive_path = os.path.join(destination, name)
+        os.makedirs(os.path.dirname(archive_path), exist_ok=True)
+        shutil.move(path, archive_path)
+        return archive_path
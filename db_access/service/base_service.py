@@ -1,10 +1,16 @@
-from typing import List, Type
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple, Type
 
 import pynamodb
 import pynamodb.exceptions
 
 from model.base_model import Model
+from common.config import SCAN_WORKERS
 from common.errors import ItemNotUnique
+from common.util import init_connection
+from service.batch_writer import BatchWriter, BatchWriteReport
 
 
 class BaseService:
@@ -36,8 +42,12 @@ class BaseService:
 
     @classmethod
     def get_all(cls):
-        items_iterator = cls.model_class.scan()
-        return [i for i in items_iterator]
+        return [item for item in cls.iter_all()]
+
+    @classmethod
+    def iter_all(cls) -> Iterator[Model]:
+        """ Lazily yield all items of the table """
+        return cls.iter_scan()
 
     @classmethod
     def check_if_exists(cls, hash_key, range_key=None):
@@ -52,26 +62,145 @@ class BaseService:
         return cls.model_class.query(*args, **kwargs)
 
     @classmethod
-    def get_latest(cls, hash_key, reverse=True, range_key_condition=None, limit=5):
+    def iter_query(cls, hash_key, range_key_condition=None, scan_index_forward=True, limit=None, page_size=None,
+                   last_evaluated_key=None, **kwargs) -> Iterator[Model]:
+        """
+        Lazily yield items matching key condition. Pages are requested from DynamoDB one by one
+        (following `last_evaluated_key`) only when previous page is consumed, and `limit` applies to matched items
+        """
         items_iterator = cls.model_class.query(
+            hash_key=hash_key,
+            range_key_condition=range_key_condition,
+            scan_index_forward=scan_index_forward,
+            limit=limit,
+            page_size=page_size,
+            last_evaluated_key=last_evaluated_key,
+            **kwargs)
+        for item in items_iterator:
+            yield item
+
+    @classmethod
+    def query_page(cls, hash_key, page_size: int, range_key_condition=None, scan_index_forward=True,
+                   last_evaluated_key=None, **kwargs) -> Tuple[List[Model], Optional[dict]]:
+        """
+        Fetch single page of items matching key condition.
+        Returns items and `last_evaluated_key`, which can be passed back to fetch next page (None if it was the last one)
+        """
+        items_iterator = cls.model_class.query(
+            hash_key=hash_key,
+            range_key_condition=range_key_condition,
+            scan_index_forward=scan_index_forward,
+            limit=page_size,
+            last_evaluated_key=last_evaluated_key,
+            **kwargs)
+        items = [item for item in items_iterator]
+        return items, items_iterator.last_evaluated_key
+
+    @classmethod
+    def scan_page(cls, page_size: int, last_evaluated_key=None, **kwargs) -> Tuple[List[Model], Optional[dict]]:
+        """
+        Fetch single page of scanned items, reading only as much of the table as the page needs.
+        Returns items and `last_evaluated_key`, which can be passed back to fetch next page (None if it was the last one)
+        """
+        items_iterator = cls.model_class.scan(limit=page_size, last_evaluated_key=last_evaluated_key, **kwargs)
+        items = [item for item in items_iterator]
+        return items, items_iterator.last_evaluated_key
+
+    @classmethod
+    def iter_latest(cls, hash_key, range_key_condition=None, limit=5) -> Iterator[Model]:
+        """ Lazily yield items with the highest range keys, newest first """
+        return cls.iter_query(
             hash_key=hash_key,
             range_key_condition=range_key_condition,
             scan_index_forward=False,
             limit=limit)
-        items_list = [item for item in items_iterator]
+
+    @classmethod
+    def get_latest(cls, hash_key, reverse=True, range_key_condition=None, limit=5):
+        """ Returns `limit` items with the highest range keys, oldest first (newest first if `reverse` is False) """
+        items_list = [item for item in cls.iter_latest(hash_key, range_key_condition=range_key_condition, limit=limit)]
         if reverse:
+            # The newest items have to be queried first anyway, so only `limit` of them are reversed in memory
             items_list = items_list[::-1]
         return items_list
 
     @classmethod
-    def scan(cls, reverse=True, **kwargs):
+    def iter_scan(cls, **kwargs) -> Iterator[Model]:
+        """ Lazily yield scanned items. Pages are requested from DynamoDB only when previous page is consumed """
         items_iterator = cls.model_class.scan(**kwargs)
-        return [item for item in items_iterator][::-1]
+        for item in items_iterator:
+            yield item
+
+    @classmethod
+    def iter_parallel_scan(cls, total_segments: int = None, **kwargs) -> Iterator[Model]:
+        """
+        Lazily yield items scanned by `total_segments` threads at once (SCAN_WORKERS by default),
+        each of them reading separate segment of the table. Items come in order of arrival, not in table order.
+        Keyword arguments are passed to scan of every segment, so e.g. `limit` applies per segment
+        """
+        total_segments = total_segments or SCAN_WORKERS
+        if total_segments <= 1:
+            for item in cls.iter_scan(**kwargs):
+                yield item
+            return
+
+        results = queue.Queue(maxsize=total_segments * 100)
+        stop_event = threading.Event()
+        segment_finished = object()
+
+        def put_result(result) -> bool:
+            while not stop_event.is_set():
+                try:
+                    results.put(result, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def scan_segment(segment: int):
+            try:
+                for segment_item in cls.model_class.scan(segment=segment, total_segments=total_segments, **kwargs):
+                    if not put_result(segment_item):
+                        return
+            except Exception as e:
+                put_result(e)
+            finally:
+                put_result(segment_finished)
+
+        init_connection(cls.model_class)
+
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            for segment in range(total_segments):
+                executor.submit(scan_segment, segment)
+            try:
+                finished_segments = 0
+                while finished_segments < total_segments:
+                    item = results.get()
+                    if item is segment_finished:
+                        finished_segments += 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                # Release workers, if iteration is interrupted or failed
+                stop_event.set()
+
+    @classmethod
+    def parallel_scan(cls, total_segments: int = None, **kwargs) -> List[Model]:
+        return [item for item in cls.iter_parallel_scan(total_segments=total_segments, **kwargs)]
+
+    @classmethod
+    def scan(cls, reverse=True, **kwargs):
+        items_list = [item for item in cls.iter_scan(**kwargs)]
+        if reverse:
+            items_list = items_list[::-1]
+        return items_list
 
     @classmethod
-    def write_batch(cls, items_data: List[dict]):
-        """ Create multiple items in batch operation, but without condition checking """
-        with cls.model_class.batch_write() as batch:
-            items = [cls.model_class(**d) for d in items_data]
-            for item in items:
-                batch.save(item)
+    def write_batch(cls, items_data: Iterable[dict], max_workers: int = None) -> BatchWriteReport:
+        """
+        Create multiple items in batch operation, but without condition checking.
+        Items, which couldn't be written despite retries, are listed in returned report
+        """
+        return BatchWriter(cls.model_class, max_workers=max_workers).write(items_data)
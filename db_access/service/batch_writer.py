@@ -0,0 +1,169 @@
+import collections
+import itertools
+import logging
+import random
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import pynamodb.exceptions
+from pynamodb.constants import BATCH_WRITE_PAGE_LIMIT, UNPROCESSED_ITEMS, PUT_REQUEST, ITEM
+
+from common.config import BATCH_WRITE_WORKERS, BATCH_WRITE_MAX_RETRIES
+from common.util import init_connection
+from model.base_model import Model
+
+logger = logging.getLogger(__name__)
+
+# Error codes of failed BatchWriteItem calls, which can succeed when retried, other errors (e.g. ValidationException)
+# would fail the same way again
+RETRYABLE_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded',
+                         'InternalServerError', 'ServiceUnavailable'}
+
+
+class BatchStats:
+    """ Statistics of writing single chunk (up to 25 items) """
+
+    def __init__(self, items_count: int):
+        self.items_count = items_count
+        self.written_count = 0
+        self.retries = 0
+        self.latency_ms = 0.0
+
+    def __repr__(self):
+        return (f"BatchStats(items={self.items_count}, written={self.written_count}, "
+                f"retries={self.retries}, latency_ms={self.latency_ms:.1f})")
+
+
+class BatchWriteReport:
+    """ Summary of bulk write: written items count, items which couldn't be written and statistics of each chunk """
+
+    def __init__(self):
+        self.written_count = 0
+        self.duplicates_count = 0  # Items dropped before writing, because they were already written
+        self.collapsed_items = []  # type: t.List[dict]  # Items replaced by later item with the same key
+        self.failed_items = []  # type: t.List[dict]
+        self.rejected_items = []  # type: t.List[dict]  # Invalid items, which couldn't be serialized
+        self.batches = []  # type: t.List[BatchStats]
+
+    @property
+    def retries(self) -> int:
+        return sum(batch.retries for batch in self.batches)
+
+    def add_batch(self, batch: BatchStats, failed_items: t.List[dict]):
+        self.batches.append(batch)
+        self.written_count += batch.written_count
+        self.failed_items.extend(failed_items)
+
+    def get_written_items(self, items_data: t.Iterable[dict]) -> t.List[dict]:
+        """ Items of `items_data`, which are stored now: not failed, rejected nor replaced by later item """
+        not_written_ids = {id(item_data) for item_data
+                           in itertools.chain(self.failed_items, self.rejected_items, self.collapsed_items)}
+        return [item_data for item_data in items_data if id(item_data) not in not_written_ids]
+
+    def __repr__(self):
+        return (f"BatchWriteReport(written={self.written_count}, duplicates={self.duplicates_count}, "
+                f"collapsed={len(self.collapsed_items)}, failed={len(self.failed_items)}, "
+                f"rejected={len(self.rejected_items)}, "
+                f"batches={len(self.batches)}, retries={self.retries})")
+
+
+class BatchWriter:
+    """
+    Bulk writer, which puts items into DynamoDB with BatchWriteItem calls (up to 25 items each).
+    Unprocessed items, throttled and other retryable failed calls are retried with exponential backoff and full jitter.
+    Chunks can be sent concurrently by multiple threads (`max_workers`).
+    Items, which couldn't be written after `max_retry_attempts`, are returned in report instead of being lost
+    """
+
+    def __init__(self, model_class: t.Type[Model], max_workers: int = None, max_retry_attempts: int = None,
+                 base_backoff_ms: int = 50, max_backoff_ms: int = 5000):
+        self.model_class = model_class
+        self.max_workers = max_workers or BATCH_WRITE_WORKERS
+        self.max_retry_attempts = BATCH_WRITE_MAX_RETRIES if max_retry_attempts is None else max_retry_attempts
+        self.base_backoff_ms = base_backoff_ms
+        self.max_backoff_ms = max_backoff_ms
+        key_attributes = [model_class._hash_key_attribute(), model_class._range_key_attribute()]
+        self._key_names = [attribute.attr_name for attribute in key_attributes if attribute is not None]
+
+    def write(self, items_data: t.Iterable[dict]) -> BatchWriteReport:
+        report = BatchWriteReport()
+        chunks = self._chunks(items_data, report.rejected_items, report.collapsed_items)
+        if self.max_workers <= 1:
+            for chunk in chunks:
+                report.add_batch(*self._write_chunk(chunk))
+        else:
+            init_connection(self.model_class)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for batch, failed_items in executor.map(self._write_chunk, chunks):
+                    report.add_batch(batch, failed_items)
+        logger.debug(f"{self.model_class.Meta.table_name}: {report}")
+        return report
+
+    def _chunks(self, items_data: t.Iterable[dict], rejected_items: t.List[dict],
+                collapsed_items: t.List[dict]) -> t.Iterator[t.List[t.Tuple[dict, dict]]]:
+        """
+        Yield lists of (item data, serialized item) pairs, each fitting into single BatchWriteItem call.
+        DynamoDB rejects whole call if it contains the same key twice and later call would overwrite item
+        of earlier one anyway, so only the last of items with the same key is written, just like it would be after
+        writing them one by one, the others are added to `collapsed_items`. Items, which can't be serialized
+        (e.g. missing key), are added to `rejected_items`, so they don't fail the rest
+        """
+        items = collections.OrderedDict()
+        for item_data in items_data:
+            try:
+                # Same serialization as used by pynamodb's own `Model.batch_write`
+                serialized_item = self.model_class(**item_data)._serialize(attr_map=True)['attributes']
+            except (ValueError, TypeError, AttributeError) as exception:
+                logger.error(f"Invalid item rejected by {self.model_class.Meta.table_name}: {item_data}: {exception}")
+                rejected_items.append(item_data)
+                continue
+            key = tuple(str(serialized_item[key_name]) for key_name in self._key_names)
+            collapsed_item = items.pop(key, None)
+            if collapsed_item is not None:
+                collapsed_items.append(collapsed_item[0])
+            items[key] = (item_data, serialized_item)
+        items = list(items.values())
+        for start in range(0, len(items), BATCH_WRITE_PAGE_LIMIT):
+            yield items[start:start + BATCH_WRITE_PAGE_LIMIT]
+
+    def _write_chunk(self, chunk: t.List[t.Tuple[dict, dict]]) -> t.Tuple[BatchStats, t.List[dict]]:
+        batch = BatchStats(items_count=len(chunk))
+        pending_items = [serialized_item for _, serialized_item in chunk]
+        start_time = time.monotonic()
+        while True:
+            try:
+                data = self.model_class._get_connection().batch_write_item(put_items=pending_items)
+                unprocessed_items = (data or {}).get(UNPROCESSED_ITEMS, {}).get(self.model_class.Meta.table_name, [])
+                unprocessed_items = [item[PUT_REQUEST][ITEM] for item in unprocessed_items]
+            except pynamodb.exceptions.PutError as e:
+                logger.warning(f"BatchWriteItem to {self.model_class.Meta.table_name} failed: {e}")
+                if not self._is_retryable(e):
+                    break
+                # Whole call failed (e.g. throttled after botocore retries), so all pending items are retried
+                unprocessed_items = pending_items
+            batch.written_count += len(pending_items) - len(unprocessed_items)
+            pending_items = unprocessed_items
+            if not pending_items or batch.retries >= self.max_retry_attempts:
+                break
+            batch.retries += 1
+            self._sleep_before_retry(batch.retries)
+        batch.latency_ms = (time.monotonic() - start_time) * 1000
+
+        failed_items = [item_data for item_data, serialized_item in chunk if serialized_item in pending_items]
+        if failed_items:
+            logger.error(f"{len(failed_items)} items couldn't be written to {self.model_class.Meta.table_name} "
+                         f"after {batch.retries} retries")
+        return batch, failed_items
+
+    @staticmethod
+    def _is_retryable(error: pynamodb.exceptions.PutError) -> bool:
+        response = getattr(error.cause, 'response', None)
+        if response is None:
+            return True  # No response from DynamoDB at all, e.g. connection error
+        status_code = response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return error.cause_response_code in RETRYABLE_ERROR_CODES or status_code >= 500
+
+    def _sleep_before_retry(self, retry: int):
+        backoff_ms = min(self.max_backoff_ms, self.base_backoff_ms * (2 ** retry))
+        time.sleep(random.uniform(0, backoff_ms) / 1000)
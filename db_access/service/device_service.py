@@ -1,8 +1,12 @@
-from pynamodb.pagination import ResultIterator
+import typing as t
+
 import pynamodb.exceptions
 
 import common.errors
+from common.cache import KnownKeysCache
+from common.config import KNOWN_KEYS_CACHE_TTL
 from service.base_service import BaseService, ItemNotUnique
+from service.batch_writer import BatchWriteReport
 from model.device_model import DeviceModel, DeviceTypeModel, DeviceGroupModel
 
 
@@ -49,6 +53,38 @@ class DeviceService(BaseService):
         )
         return result
 
+    @classmethod
+    def create_devices(cls, devices: t.List[dict]) -> BatchWriteReport:
+        """
+        Create multiple devices in batch operation, existing devices with the same ids are overwritten.
+        Each device group and type used in the batch is created once, only if it's not known to exist yet
+        """
+        devices_data = []
+        for device in devices:
+            device_data = dict(device)
+            device_data.setdefault('device_type', "Unprovided")
+            device_data.setdefault('device_group', "Unprovided")
+            device_data['settings'] = device_data.get('settings') or {}
+            devices_data.append(device_data)
+
+        report = cls.write_batch(devices_data)
+        written_devices = report.get_written_items(devices_data)
+        for device_group in set(device['device_group'] for device in written_devices):
+            DeviceGroupService.create_device_group_if_not_exist(
+                device_group=device_group,
+                description="Created automatically during adding new device process"
+            )
+        for device_type in set(device['device_type'] for device in written_devices):
+            DeviceTypeService.create_device_type_if_not_exist(
+                device_type=device_type,
+                description="Created automatically during adding new device process"
+            )
+        if report.failed_items or report.rejected_items:
+            raise common.errors.BatchWriteError(
+                f'{len(report.failed_items) + len(report.rejected_items)} of {len(devices_data)} devices '
+                f'could not be written', report)
+        return report
+
     @classmethod
     def get_device_by_id(cls, device_id) -> DeviceModel:
         return DeviceModel.get(hash_key=device_id)
@@ -58,32 +94,44 @@ class DeviceService(BaseService):
         return cls.check_if_exists(hash_key=device_id)
 
     @classmethod
-    def get_devices_by_device_type(cls, device_type: str) -> ResultIterator:
-        return cls.scan(DeviceModel.device_type.startswith(device_type) & DeviceModel.device_type.endswith(device_type))
+    def get_devices_by_device_type(cls, device_type: str) -> t.Iterator[DeviceModel]:
+        return cls.iter_scan(filter_condition=DeviceModel.device_type == device_type)
 
     @classmethod
-    def get_devices_by_device_group(cls, device_group: str) -> ResultIterator:
-        return cls.scan(DeviceModel.device_group.startswith(device_group) & DeviceModel.device_group.endswith(device_group))
+    def get_devices_by_device_group(cls, device_group: str) -> t.Iterator[DeviceModel]:
+        return cls.iter_scan(filter_condition=DeviceModel.device_group == device_group)
 
 
 class DeviceTypeService(BaseService):
     model_class = DeviceTypeModel
+    # Names of device types already stored in database, loaded with single scan
+    known_names = KnownKeysCache(
+        loader=lambda: (item.device_type for item in DeviceTypeService.iter_scan(attributes_to_get=['device_type'])),
+        ttl=KNOWN_KEYS_CACHE_TTL)
 
     @classmethod
     def create_device_type(cls,
                            device_type: str,
                            description: str = None
                            ) -> DeviceTypeModel:
-        return cls.create_with_condition(
-            device_type=device_type,
-            description=description,
+        try:
+            result = cls.create_with_condition(
+                device_type=device_type,
+                description=description,
 
-            condition=cls.model_class.device_type.does_not_exist(),
-            error_message=f'Device Type with specified id ("{device_type}") already exists!'
-        )
+                condition=cls.model_class.device_type.does_not_exist(),
+                error_message=f'Device Type with specified id ("{device_type}") already exists!'
+            )
+        except ItemNotUnique:
+            cls.known_names.add(device_type)
+            raise
+        cls.known_names.add(device_type)
+        return result
 
     @classmethod
     def create_device_type_if_not_exist(cls, device_type: str, description: str = None) -> DeviceTypeModel:
+        if device_type in cls.known_names:
+            return None
         try:
             return cls.create_device_type(device_type=device_type, description=description)
         except (pynamodb.exceptions.PutError, common.errors.ItemNotUnique):
@@ -100,19 +148,31 @@ class DeviceTypeService(BaseService):
 
 class DeviceGroupService(BaseService):
     model_class = DeviceGroupModel
+    # Names of device groups already stored in database, loaded with single scan
+    known_names = KnownKeysCache(
+        loader=lambda: (item.device_group for item in DeviceGroupService.iter_scan(attributes_to_get=['device_group'])),
+        ttl=KNOWN_KEYS_CACHE_TTL)
 
     @classmethod
     def create_device_group(cls, device_group: str, description: str = None) -> DeviceGroupModel:
-        return cls.create_with_condition(
-            device_group=device_group,
-            description=description,
+        try:
+            result = cls.create_with_condition(
+                device_group=device_group,
+                description=description,
 
-            condition=cls.model_class.device_group.does_not_exist(),
-            error_message=f'Device Group with specified id ("{device_group}") already exists!'
-        )
+                condition=cls.model_class.device_group.does_not_exist(),
+                error_message=f'Device Group with specified id ("{device_group}") already exists!'
+            )
+        except ItemNotUnique:
+            cls.known_names.add(device_group)
+            raise
+        cls.known_names.add(device_group)
+        return result
 
     @classmethod
     def create_device_group_if_not_exist(cls, device_group: str, description: str = None) -> DeviceGroupModel:
+        if device_group in cls.known_names:
+            return None
         try:
             return cls.create_device_group(device_group=device_group, description=description)
         except (pynamodb.exceptions.PutError, common.errors.ItemNotUnique):
@@ -0,0 +1,110 @@
+"""
+Columnar export of measurements of device. Query pages are parsed straight from DynamoDB response,
+without creating `MeasurementModel` objects, into contiguous timestamp and value columns.
+NumPy and pyarrow are optional, each is required only by formats using it
+"""
+import typing as t
+
+from pynamodb.constants import ITEMS, LAST_EVALUATED_KEY
+
+from model.measurement_model import MeasurementModel
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FORMATS = ('numpy', 'arrow', 'parquet')
+EXPORTED_ATTRIBUTES = ['timestamp', 'value', 'measurement_type']
+
+Columns = t.Dict[str, list]
+
+
+def iter_measurement_pages(device_id: str, start_timestamp: int, end_timestamp: int, measurement_type: str = None,
+                           page_size: int = None) -> t.Iterator[Columns]:
+    """ Stream measurements of device from time range (both ends inclusive) as columns, one query page at a time """
+    connection = MeasurementModel._get_connection()
+    filter_condition = MeasurementModel.measurement_type == measurement_type if measurement_type else None
+    last_evaluated_key = None
+    while True:
+        data = connection.query(
+            device_id,
+            range_key_condition=MeasurementModel.timestamp.between(start_timestamp, end_timestamp),
+            filter_condition=filter_condition,
+            attributes_to_get=EXPORTED_ATTRIBUTES,
+            exclusive_start_key=last_evaluated_key,
+            limit=page_size)
+        items = data.get(ITEMS, [])
+        if items:
+            yield {
+                'timestamp': [int(float(item['timestamp']['N'])) for item in items],
+                'value': [float(item['value']['N']) for item in items],
+                'measurement_type': [item['measurement_type']['S'] for item in items],
+            }
+        last_evaluated_key = data.get(LAST_EVALUATED_KEY)
+        if not last_evaluated_key:
+            break
+
+
+def _require(module, name: str, fmt: str):
+    if module is None:
+        raise ImportError(f"Export to '{fmt}' requires {name}, install it or use other format")
+
+
+def export_to_numpy(pages: t.Iterable[Columns]) -> t.Dict[str, 'numpy.ndarray']:
+    """ Returns columns as NumPy arrays (int64 timestamp, float64 value, str measurement_type) """
+    _require(numpy, 'numpy', 'numpy')
+    timestamps, values, measurement_types = [], [], []
+    for page in pages:
+        timestamps.append(numpy.array(page['timestamp'], dtype=numpy.int64))
+        values.append(numpy.array(page['value'], dtype=numpy.float64))
+        measurement_types.append(numpy.array(page['measurement_type'], dtype=str))
+    # Pages are concatenated once, so each column ends up in single contiguous buffer
+    return {
+        'timestamp': numpy.concatenate(timestamps) if timestamps else numpy.empty(0, dtype=numpy.int64),
+        'value': numpy.concatenate(values) if values else numpy.empty(0, dtype=numpy.float64),
+        'measurement_type': numpy.concatenate(measurement_types) if measurement_types else numpy.empty(0, dtype=str),
+    }
+
+
+def _get_arrow_schema() -> 'pyarrow.Schema':
+    return pyarrow.schema([
+        ('timestamp', pyarrow.int64()),
+        ('value', pyarrow.float64()),
+        ('measurement_type', pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+    ])
+
+
+def _get_record_batch(page: Columns, schema: 'pyarrow.Schema') -> 'pyarrow.RecordBatch':
+    return pyarrow.RecordBatch.from_arrays([
+        pyarrow.array(page['timestamp'], type=pyarrow.int64()),
+        pyarrow.array(page['value'], type=pyarrow.float64()),
+        pyarrow.array(page['measurement_type'], type=pyarrow.string()).dictionary_encode(),
+    ], schema=schema)
+
+
+def export_to_arrow(pages: t.Iterable[Columns]) -> 'pyarrow.Table':
+    """ Returns Arrow table with timestamp, value and (dictionary encoded) measurement_type columns """
+    _require(pyarrow, 'pyarrow', 'arrow')
+    schema = _get_arrow_schema()
+    table = pyarrow.Table.from_batches([_get_record_batch(page, schema) for page in pages], schema=schema)
+    return table.combine_chunks()
+
+
+def export_to_parquet(pages: t.Iterable[Columns], path: str) -> str:
+    """ Writes columns into Parquet file, each query page is written (as row group) as soon as it is read """
+    _require(pyarrow, 'pyarrow', 'parquet')
+    schema = _get_arrow_schema()
+    writer = pyarrow.parquet.ParquetWriter(path, schema, compression='zstd')
+    try:
+        for page in pages:
+            writer.write_table(pyarrow.Table.from_batches([_get_record_batch(page, schema)], schema=schema))
+    finally:
+        writer.close()
+    return path
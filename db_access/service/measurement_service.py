@@ -1,19 +1,31 @@
+import logging
 import typing as t
 
 import pynamodb.exceptions
 
 import common.errors
-from common.util import get_timestamp, generate_label
+from common.cache import KnownKeysCache, KnownValuesCache, RecentKeysCache
+from common.config import KNOWN_KEYS_CACHE_TTL, DEDUPLICATION_CACHE_SIZE, MEASUREMENT_RETENTION_DAYS
+from common.util import get_timestamp, generate_label, get_time_buckets
+from service import measurement_export
 from service.base_service import BaseService
-from model.measurement_model import MeasurementModel, MeasurementTypeModel
+from service.batch_writer import BatchWriter, BatchWriteReport
+from service.device_service import DeviceService
+from model.measurement_model import MeasurementModel, MeasurementTypeModel, LatestMeasurementModel, \
+    MeasurementRollupModel, MinuteRollupModel, HourRollupModel, DayRollupModel
+
+logger = logging.getLogger(__name__)
 
 
 class MeasurementService(BaseService):
     model_class = MeasurementModel
+    # Keys of measurements written recently by this process, redelivered copies of them are not written again
+    recently_written = RecentKeysCache(max_size=DEDUPLICATION_CACHE_SIZE)
 
     @classmethod
     def create_measurement(cls, device_id: str, value: int or float, measurement_type: str,
                            timestamp: int = None) -> MeasurementModel:
+        timestamp = timestamp or get_timestamp()
         result = cls.create_with_condition(
             condition=MeasurementModel.timestamp.does_not_exist(),
             error_message=f'Measurement with specified timestamp ({timestamp})'
@@ -21,8 +33,13 @@ class MeasurementService(BaseService):
             device_id=device_id,
             value=value,
             measurement_type=measurement_type,
-            timestamp=timestamp or get_timestamp(),
+            timestamp=timestamp,
+            expires_at=cls.get_expiration_time(measurement_type, timestamp),
         )
+        LatestMeasurementService.update_latest_measurement(
+            device_id=device_id, measurement_type=measurement_type, timestamp=timestamp, value=value)
+        MeasurementRollupService.update_rollups([{
+            'device_id': device_id, 'measurement_type': measurement_type, 'timestamp': timestamp, 'value': value}])
         MeasurementTypeService.create_measurement_type_if_not_exist(
             name=measurement_type,
             label=generate_label(measurement_type),
@@ -31,19 +48,141 @@ class MeasurementService(BaseService):
         return result
 
     @classmethod
-    def create_measurements(cls, measurements: t.List[dict]):
-        cls.write_batch(measurements)
-        measurements_types = set([measurement.get('measurement_type') for measurement in measurements])
+    def iter_measurements_for_device(cls, device_id: str, start_timestamp: int, end_timestamp: int,
+                                     limit: int = None, newest_first: bool = False,
+                                     **kwargs) -> t.Iterator[MeasurementModel]:
+        """ Stream measurements of single device from given time range (both ends inclusive) """
+        return cls.iter_query(
+            hash_key=device_id,
+            range_key_condition=MeasurementModel.timestamp.between(start_timestamp, end_timestamp),
+            scan_index_forward=not newest_first,
+            limit=limit,
+            **kwargs)
+
+    @classmethod
+    def iter_measurements_for_time_range(cls, start_timestamp: int, end_timestamp: int,
+                                         **kwargs) -> t.Iterator[MeasurementModel]:
+        """
+        Stream measurements of all devices from given time range (both ends inclusive), oldest first.
+        Time buckets are queried one after another, they don't overlap, so results stay ordered by timestamp
+        """
+        for time_bucket in get_time_buckets(start_timestamp, end_timestamp):
+            items_iterator = MeasurementModel.time_bucket_index.query(
+                time_bucket,
+                range_key_condition=MeasurementModel.timestamp.between(start_timestamp, end_timestamp),
+                **kwargs)
+            for item in items_iterator:
+                yield item
+
+    @classmethod
+    def export_range(cls, device_id: str, start_timestamp: int, end_timestamp: int, fmt: str = 'numpy',
+                     measurement_type: str = None, path: str = None, page_size: int = None):
+        """
+        Export measurements of device from time range (both ends inclusive) into columns (timestamp, value,
+        measurement_type), without creating model objects. `fmt` is one of:
+        'numpy' - dict of NumPy arrays, 'arrow' - pyarrow Table, 'parquet' - Parquet file written to `path`
+        """
+        if fmt not in measurement_export.EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}, supported ones are: "
+                             f"{', '.join(measurement_export.EXPORT_FORMATS)}")
+        if fmt == 'parquet' and not path:
+            raise ValueError("Export to 'parquet' requires path")
+        pages = measurement_export.iter_measurement_pages(device_id, start_timestamp, end_timestamp,
+                                                          measurement_type=measurement_type, page_size=page_size)
+        if fmt == 'numpy':
+            return measurement_export.export_to_numpy(pages)
+        if fmt == 'arrow':
+            return measurement_export.export_to_arrow(pages)
+        return measurement_export.export_to_parquet(pages, path)
+
+    @classmethod
+    def backfill_time_buckets(cls) -> int:
+        """ Add time bucket to measurements saved before time bucket index was introduced, returns their number """
+        updated_count = 0
+        with cls.model_class.batch_write() as batch:
+            for item in cls.iter_scan(filter_condition=MeasurementModel.time_bucket.does_not_exist()):
+                batch.save(item)
+                updated_count += 1
+        return updated_count
+
+    @staticmethod
+    def get_expiration_time(measurement_type: str, timestamp: int or float) -> t.Optional[int]:
+        """ Returns Unix time (in seconds) when measurement expires, None if measurements of its type don't expire """
+        retention_days = MeasurementTypeService.get_retention_days(measurement_type)
+        if not retention_days:
+            return None
+        return int(timestamp / 1000 + retention_days * 24 * 60 * 60)
+
+    @classmethod
+    def add_expiration_time(cls, measurement: dict) -> dict:
+        """ Returns copy of measurement with `expires_at` set, measurement itself if it doesn't expire """
+        if measurement.get('expires_at') is not None:
+            return measurement
+        expiration_time = cls.get_expiration_time(measurement['measurement_type'], measurement['timestamp'])
+        if expiration_time is None:
+            return measurement
+        return {**measurement, 'expires_at': expiration_time}
+
+    @staticmethod
+    def get_measurement_key(measurement: dict) -> tuple:
+        return measurement['device_id'], measurement['measurement_type'], measurement['timestamp']
+
+    @classmethod
+    def drop_duplicated_measurements(cls, measurements: t.List[dict]) -> t.List[dict]:
+        """ Returns measurements without repetitions and without the ones recently written by this process """
+        unique_measurements = []
+        seen_keys = set()
+        for measurement in measurements:
+            key = cls.get_measurement_key(measurement)
+            if key in seen_keys or key in cls.recently_written:
+                continue
+            seen_keys.add(key)
+            unique_measurements.append(measurement)
+        return unique_measurements
+
+    @classmethod
+    def create_measurements(cls, measurements: t.List[dict], deduplicate: bool = True) -> BatchWriteReport:
+        """
+        Write measurements in batch operation. Unless `deduplicate` is False, measurements already written recently
+        (e.g. redelivered or republished by device) are dropped, their number is returned in report.
+        Expiration time is set according to retention of measurement type
+        """
+        all_measurements_count = len(measurements)
+        if deduplicate:
+            measurements = cls.drop_duplicated_measurements(measurements)
+        measurements = [cls.add_expiration_time(measurement) for measurement in measurements]
+        report = cls.write_batch(measurements)
+        report.duplicates_count = all_measurements_count - len(measurements)
+        written_measurements = report.get_written_items(measurements)
+        cls.recently_written.update(cls.get_measurement_key(m) for m in written_measurements)
+        LatestMeasurementService.update_latest_measurements(written_measurements)
+        MeasurementRollupService.update_rollups(written_measurements)
+        measurements_types = set([measurement.get('measurement_type') for measurement in written_measurements])
         for measurement_type in measurements_types:
             MeasurementTypeService.create_measurement_type_if_not_exist(
                 name=measurement_type,
                 label=generate_label(measurement_type),
                 description="Created automatically during adding measurements"
             )
+        if report.failed_items or report.rejected_items:
+            raise common.errors.BatchWriteError(
+                f'{len(report.failed_items) + len(report.rejected_items)} of {all_measurements_count} measurements '
+                f'could not be written', report)
+        return report
 
 
 class MeasurementTypeService(BaseService):
     model_class = MeasurementTypeModel
+    # Names of measurement types already stored in database, loaded with single scan
+    known_names = KnownKeysCache(
+        loader=lambda: (item.name for item in MeasurementTypeService.iter_scan(attributes_to_get=['name'])),
+        ttl=KNOWN_KEYS_CACHE_TTL)
+    # Retention (in days) of measurement types, which have it set, loaded with single scan
+    known_retention_days = KnownValuesCache(
+        loader=lambda: ((item.name, item.retention_days) for item in MeasurementTypeService.iter_scan(
+            attributes_to_get=['name', 'retention_days'],
+            filter_condition=MeasurementTypeModel.retention_days.exists())),
+        ttl=KNOWN_KEYS_CACHE_TTL)
 
     @classmethod
     def create_measurement_type(cls,
@@ -51,16 +190,26 @@ class MeasurementTypeService(BaseService):
                                 label: str = None,
                                 description: str = None,
                                 unit: str = "",
-                                priority: int = 0) -> MeasurementTypeModel:
-        return cls.create_with_condition(
-            name=name,
-            label=label,
-            description=description,
-            unit=unit,
-            priority=priority,
-            condition=cls.model_class.name.does_not_exist(),
-            error_message=f'Measurement Type with specified id ("{name}") already exists!'
-        )
+                                priority: int = 0,
+                                retention_days: float = None) -> MeasurementTypeModel:
+        try:
+            result = cls.create_with_condition(
+                name=name,
+                label=label,
+                description=description,
+                unit=unit,
+                priority=priority,
+                retention_days=retention_days,
+                condition=cls.model_class.name.does_not_exist(),
+                error_message=f'Measurement Type with specified id ("{name}") already exists!'
+            )
+        except common.errors.ItemNotUnique:
+            cls.known_names.add(name)
+            raise
+        cls.known_names.add(name)
+        if retention_days is not None:
+            cls.known_retention_days.add(name, retention_days)
+        return result
 
     @classmethod
     def create_measurement_type_if_not_exist(cls,
@@ -69,8 +218,228 @@ class MeasurementTypeService(BaseService):
                                              description: str = None,
                                              unit: str = "",
                                              priority: int = 0) -> MeasurementTypeModel:
+        if name in cls.known_names:
+            return None
         try:
             return cls.create_measurement_type(name=name, label=label or generate_label(name),
                                                description=description, priority=priority, unit=unit)
         except (pynamodb.exceptions.PutError, common.errors.ItemNotUnique):
             pass
+
+    @classmethod
+    def get_retention_days(cls, name: str) -> float:
+        """ Days after which measurements of given type expire (0 means never), changes are noticed after cache ttl """
+        retention_days = cls.known_retention_days.get(name)
+        return MEASUREMENT_RETENTION_DAYS if retention_days is None else retention_days
+
+
+class LatestMeasurementService(BaseService):
+    model_class = LatestMeasurementModel
+
+    @classmethod
+    def update_latest_measurement(cls, device_id: str, measurement_type: str, timestamp: int,
+                                  value: int or float) -> bool:
+        """ Store measurement as the latest one, unless newer measurement of this type is already stored """
+        try:
+            cls.create_with_condition(
+                condition=(cls.model_class.timestamp.does_not_exist() | (cls.model_class.timestamp < timestamp)),
+                device_id=device_id,
+                measurement_type=measurement_type,
+                timestamp=timestamp,
+                value=value,
+            )
+            return True
+        except common.errors.ItemNotUnique:
+            return False
+
+    @classmethod
+    def update_latest_measurements(cls, measurements: t.List[dict]):
+        """ Update projection with the newest measurement of each device and type found in provided measurements """
+        newest_measurements = {}
+        for measurement in measurements:
+            key = (measurement['device_id'], measurement['measurement_type'])
+            if key not in newest_measurements or newest_measurements[key]['timestamp'] < measurement['timestamp']:
+                newest_measurements[key] = measurement
+        for measurement in newest_measurements.values():
+            cls.update_latest_measurement(
+                device_id=measurement['device_id'],
+                measurement_type=measurement['measurement_type'],
+                timestamp=measurement['timestamp'],
+                value=measurement['value'])
+
+    @classmethod
+    def rebuild_latest_measurements(cls) -> int:
+        """
+        Seed projection with the newest measurement of each device and type, e.g. for measurements written
+        before it was introduced. Newer measurements already stored aren't overwritten. Returns number of updated ones
+        """
+        measurement_types = {measurement_type.name for measurement_type in MeasurementTypeService.iter_all()}
+        updated_count = 0
+        for device in DeviceService.iter_all():
+            # Single newest first query per device, the first measurement of each type is its newest one
+            newest_measurements = {}
+            for measurement in MeasurementService.iter_query(device.device_id, scan_index_forward=False):
+                newest_measurements.setdefault(measurement.measurement_type, measurement)
+                if measurement_types.issubset(newest_measurements):
+                    break
+            for measurement in newest_measurements.values():
+                updated_count += cls.update_latest_measurement(
+                    device_id=measurement.device_id,
+                    measurement_type=measurement.measurement_type,
+                    timestamp=measurement.timestamp,
+                    value=measurement.value)
+        return updated_count
+
+    @classmethod
+    def get_newest_measurement_for_all_devices(cls) -> t.Dict[str, LatestMeasurementModel]:
+        """ Returns the newest measurement (of any type) of every device, read with single scan """
+        newest_measurements = {}
+        for measurement in cls.iter_all():
+            newest_measurement = newest_measurements.get(measurement.device_id)
+            if newest_measurement is None or newest_measurement.timestamp < measurement.timestamp:
+                newest_measurements[measurement.device_id] = measurement
+        return newest_measurements
+
+
+class MeasurementRollupService:
+    """ Maintains minute, hour and day rollups of measurements (see `MeasurementRollupModel`) """
+    model_classes = (MinuteRollupModel, HourRollupModel, DayRollupModel)  # From the finest to the coarsest
+
+    @staticmethod
+    def aggregate_measurements(model_class: t.Type[MeasurementRollupModel],
+                               measurements: t.Iterable[dict]) -> t.Dict[t.Tuple[str, str], dict]:
+        """ Aggregate measurements into buckets of rollup, returns aggregates by (device_id, bucket_key) """
+        aggregates = {}
+        for measurement in measurements:
+            bucket_timestamp = model_class.get_bucket_timestamp(measurement['timestamp'])
+            bucket_key = model_class.get_bucket_key(bucket_timestamp, measurement['measurement_type'])
+            key = (measurement['device_id'], bucket_key)
+            value = measurement['value']
+            aggregate = aggregates.get(key)
+            if aggregate is None:
+                aggregates[key] = {
+                    'measurement_type': measurement['measurement_type'],
+                    'timestamp': bucket_timestamp,
+                    'measurements_count': 1,
+                    'values_sum': value,
+                    'min_value': value,
+                    'max_value': value,
+                    'last_value': value,
+                    'last_timestamp': measurement['timestamp'],
+                }
+                continue
+            aggregate['measurements_count'] += 1
+            aggregate['values_sum'] += value
+            aggregate['min_value'] = min(aggregate['min_value'], value)
+            aggregate['max_value'] = max(aggregate['max_value'], value)
+            if aggregate['last_timestamp'] < measurement['timestamp']:
+                aggregate['last_value'] = value
+                aggregate['last_timestamp'] = measurement['timestamp']
+        return aggregates
+
+    @classmethod
+    def update_rollups(cls, measurements: t.List[dict]):
+        """
+        Add written measurements to rollups. Measurements are aggregated locally first, so each rollup bucket
+        is updated once per call, with atomic ADD of count and sum. Measurements usually come in order, so last value
+        is set by the same update, if it's newer. Minimum and maximum can't be added, so they are set with
+        conditional update, only when returned rollup shows they changed.
+        Measurements with the same key overwrite each other, so only the last of them is added.
+        Errors are logged and not raised, measurements are already written at this point
+        """
+        measurements = list({(measurement['device_id'], measurement['timestamp']): measurement
+                             for measurement in measurements}.values())
+        for model_class in cls.model_classes:
+            for (device_id, bucket_key), aggregate in cls.aggregate_measurements(model_class, measurements).items():
+                try:
+                    cls._update_rollup(model_class(device_id, bucket_key), aggregate)
+                except pynamodb.exceptions.PynamoDBException as e:
+                    logger.error(f"Rollup {bucket_key} of device {device_id} in {model_class.Meta.table_name} "
+                                 f"could not be updated: {e}")
+
+    @staticmethod
+    def _update_rollup(rollup: MeasurementRollupModel, aggregate: dict):
+        model_class = type(rollup)
+        actions = [
+            model_class.measurement_type.set(aggregate['measurement_type']),
+            model_class.timestamp.set(aggregate['timestamp']),
+            model_class.measurements_count.add(aggregate['measurements_count']),
+            model_class.values_sum.add(aggregate['values_sum']),
+            model_class.min_value.set(model_class.min_value | aggregate['min_value']),
+            model_class.max_value.set(model_class.max_value | aggregate['max_value']),
+        ]
+        # Returned (updated) rollup is deserialized into `rollup`
+        try:
+            rollup.update(
+                actions=actions + [model_class.last_value.set(aggregate['last_value']),
+                                   model_class.last_timestamp.set(aggregate['last_timestamp'])],
+                condition=(model_class.last_timestamp.does_not_exist()
+                           | (model_class.last_timestamp < aggregate['last_timestamp'])))
+        except pynamodb.exceptions.UpdateError as e:
+            if e.cause_response_code != 'ConditionalCheckFailedException':
+                raise
+            # Rollup already has newer measurement, so only count and sum are added
+            rollup.update(actions=actions)
+        conditional_updates = []
+        if rollup.min_value > aggregate['min_value']:
+            conditional_updates.append((
+                [model_class.min_value.set(aggregate['min_value'])],
+                model_class.min_value > aggregate['min_value']))
+        if rollup.max_value < aggregate['max_value']:
+            conditional_updates.append((
+                [model_class.max_value.set(aggregate['max_value'])],
+                model_class.max_value < aggregate['max_value']))
+        for actions, condition in conditional_updates:
+            try:
+                rollup.update(actions=actions, condition=condition)
+            except pynamodb.exceptions.UpdateError as e:
+                # Concurrent update has already set better value
+                if e.cause_response_code != 'ConditionalCheckFailedException':
+                    raise
+
+    @classmethod
+    def get_rollup_model(cls, resolution: int) -> t.Optional[t.Type[MeasurementRollupModel]]:
+        """ Returns the coarsest rollup, which buckets aren't wider than `resolution` (milliseconds), if any """
+        suitable_model_classes = [model_class for model_class in cls.model_classes
+                                  if model_class.bucket_size <= resolution]
+        return suitable_model_classes[-1] if suitable_model_classes else None
+
+    @staticmethod
+    def iter_rollups(model_class: t.Type[MeasurementRollupModel], device_id: str, start_timestamp: int,
+                     end_timestamp: int, **kwargs) -> t.Iterator[MeasurementRollupModel]:
+        """ Stream rollups of device, which buckets start in given time range (both ends inclusive), oldest first """
+        start_key = model_class.get_bucket_key(model_class.get_bucket_timestamp(start_timestamp), '')
+        # Keys of the last bucket are its timestamp followed by '#<type>' and '$' sorts right after '#'
+        end_key = f"{model_class.get_bucket_timestamp(end_timestamp):015d}$"
+        return model_class.query(device_id, range_key_condition=model_class.bucket_key.between(start_key, end_key),
+                                 **kwargs)
+
+    @classmethod
+    def rebuild_rollups(cls, device_id: str, start_timestamp: int, end_timestamp: int) -> int:
+        """
+        Recompute rollups of device from raw measurements, e.g. for measurements written before rollups
+        were introduced. Range should be aligned to days, buckets partially covered by it are overwritten
+        with partial aggregates. Measurements are read one day at a time. Returns number of written rollups
+        """
+        written_count = 0
+        day_model_class = cls.model_classes[-1]
+        first_day_timestamp = day_model_class.get_bucket_timestamp(start_timestamp)
+        for day_timestamp in range(first_day_timestamp, int(end_timestamp) + 1, day_model_class.bucket_size):
+            # Buckets of all rollups fit into days, so each of them is written once
+            day_measurements = [
+                {'device_id': measurement.device_id, 'measurement_type': measurement.measurement_type,
+                 'timestamp': measurement.timestamp, 'value': measurement.value}
+                for measurement in MeasurementService.iter_measurements_for_device(
+                    device_id, max(day_timestamp, start_timestamp),
+                    min(day_timestamp + day_model_class.bucket_size - 1, end_timestamp))]
+            for model_class in cls.model_classes:
+                rollups = [{'device_id': rollup_device_id, 'bucket_key': bucket_key, **aggregate}
+                           for (rollup_device_id, bucket_key), aggregate
+                           in cls.aggregate_measurements(model_class, day_measurements).items()]
+                report = BatchWriter(model_class).write(rollups)
+                if report.failed_items or report.rejected_items:
+                    raise common.errors.BatchWriteError(
+                        f'{len(report.failed_items) + len(report.rejected_items)} rollups could not be written '
+                        f'to {model_class.Meta.table_name}', report)
+                written_count += report.written_count
+        return written_count
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Packages of db_access are imported as top level ones (see README)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
@@ -0,0 +1,27 @@
+import pytest
+
+from view.measurement_view import iter_lttb
+
+
+@pytest.mark.parametrize('threshold', [3, 4, 10, 100])
+def test_lttb_returns_at_most_threshold_points(threshold):
+    points = [(timestamp, timestamp % 7) for timestamp in range(1001)]
+    downsampled_points = list(iter_lttb(points, 0, 1000, threshold))
+    assert len(downsampled_points) == threshold
+    assert downsampled_points[0] == points[0]
+    assert downsampled_points[-1] == points[-1]
+
+
+@pytest.mark.parametrize('threshold', [3, 4, 10])
+def test_lttb_point_at_end_timestamp_doesnt_add_bucket(threshold):
+    # Points at the very end of range would form bucket of their own, on top of `threshold - 2` ones
+    points = [(timestamp, timestamp % 7) for timestamp in range(1000)] + [(1000, 1), (1000, 2)]
+    downsampled_points = list(iter_lttb(points, 0, 1000, threshold))
+    assert len(downsampled_points) == threshold
+    assert downsampled_points[-1] == (1000, 2)
+
+
+def test_lttb_keeps_fewer_points_than_threshold():
+    points = [(0, 1), (500, 2), (1000, 3)]
+    assert list(iter_lttb(points, 0, 1000, 10)) == points
+    assert list(iter_lttb([], 0, 1000, 10)) == []
@@ -0,0 +1,143 @@
+"""
+Vectorised analytics over measurement series, requires NumPy.
+Series are loaded with `MeasurementService.export_range` (without creating model objects) and both series
+and reports are cached per (device, measurement type, time range), so repeated reports don't read them again
+"""
+import functools
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+from common.config import ANALYTICS_CACHE_SIZE, SCAN_WORKERS
+from common.util import init_connection
+from model.measurement_model import MeasurementModel
+from service.device_service import DeviceService
+from service.measurement_service import MeasurementService
+from view.base_view import BaseView
+
+
+class Series(t.NamedTuple):
+    timestamps: numpy.ndarray  # int64, milliseconds
+    values: numpy.ndarray  # float64
+
+
+def _get_windows(values: numpy.ndarray, window: int) -> numpy.ndarray:
+    """ Read-only view of all windows of `window` consecutive values, shape is (len(values) - window + 1, window) """
+    stride = values.strides[0]
+    return as_strided(values, shape=(len(values) - window + 1, window), strides=(stride, stride), writeable=False)
+
+
+def _pad_rolling(result: numpy.ndarray, size: int) -> numpy.ndarray:
+    """ Rolling results are aligned to the last value of window, values without complete window are NaN """
+    return numpy.concatenate([numpy.full(size - len(result), numpy.nan), result])
+
+
+def rolling_mean(values: numpy.ndarray, window: int) -> numpy.ndarray:
+    if len(values) < window:
+        return numpy.full(len(values), numpy.nan)
+    sums = numpy.cumsum(numpy.insert(values, 0, 0.0))
+    return _pad_rolling((sums[window:] - sums[:-window]) / window, len(values))
+
+
+def rolling_std(values: numpy.ndarray, window: int) -> numpy.ndarray:
+    """ Population standard deviation of each window, computed from running sums of values and their squares """
+    if len(values) < window:
+        return numpy.full(len(values), numpy.nan)
+    # Values are shifted by their mean, so running sums stay small and variance is not lost to rounding
+    shifted_values = values - values.mean()
+    sums = numpy.cumsum(numpy.insert(shifted_values, 0, 0.0))
+    squares_sums = numpy.cumsum(numpy.insert(shifted_values ** 2, 0, 0.0))
+    window_sums = sums[window:] - sums[:-window]
+    window_squares_sums = squares_sums[window:] - squares_sums[:-window]
+    variances = numpy.maximum(window_squares_sums / window - (window_sums / window) ** 2, 0.0)
+    return _pad_rolling(numpy.sqrt(variances), len(values))
+
+
+def rolling_min(values: numpy.ndarray, window: int) -> numpy.ndarray:
+    if len(values) < window:
+        return numpy.full(len(values), numpy.nan)
+    return _pad_rolling(_get_windows(values, window).min(axis=1), len(values))
+
+
+def rolling_max(values: numpy.ndarray, window: int) -> numpy.ndarray:
+    if len(values) < window:
+        return numpy.full(len(values), numpy.nan)
+    return _pad_rolling(_get_windows(values, window).max(axis=1), len(values))
+
+
+def detect_gaps(timestamps: numpy.ndarray, max_gap: int) -> numpy.ndarray:
+    """ Returns (last timestamp before gap, first timestamp after it) pairs of gaps longer than `max_gap` ms """
+    gap_indexes = numpy.flatnonzero(numpy.diff(timestamps) > max_gap)
+    return numpy.stack([timestamps[gap_indexes], timestamps[gap_indexes + 1]], axis=1)
+
+
+def rate_of_change(timestamps: numpy.ndarray, values: numpy.ndarray) -> numpy.ndarray:
+    """ Change of value per second between consecutive measurements (one element shorter than series) """
+    time_differences = numpy.diff(timestamps) / 1000
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        rates = numpy.diff(values) / time_differences
+    rates[time_differences == 0] = numpy.nan
+    return rates
+
+
+class AnalyticsView(BaseView):
+
+    @staticmethod
+    @functools.lru_cache(maxsize=ANALYTICS_CACHE_SIZE)
+    def get_series(device_id: str, measurement_type: str, start_timestamp: int, end_timestamp: int) -> Series:
+        """ Load measurements of selected type of device from time range, arrays are read-only as they are cached """
+        columns = MeasurementService.export_range(device_id, start_timestamp, end_timestamp, fmt='numpy',
+                                                  measurement_type=measurement_type)
+        series = Series(timestamps=columns['timestamp'], values=columns['value'])
+        for column in series:
+            column.flags.writeable = False
+        return series
+
+    @classmethod
+    @functools.lru_cache(maxsize=ANALYTICS_CACHE_SIZE)
+    def get_report(cls, device_id: str, measurement_type: str, start_timestamp: int, end_timestamp: int,
+                   window: int = 10, max_gap: int = 60 * 1000) -> dict:
+        """
+        Summary of series: count, min, max, mean, std, gaps longer than `max_gap` ms, the largest rate of change
+        (per second) and the largest deviation of value from rolling mean of `window` measurements (in rolling stds).
+        Report is cached, so it must not be modified
+        """
+        series = cls.get_series(device_id, measurement_type, start_timestamp, end_timestamp)
+        timestamps, values = series
+        report = {
+            'device_id': device_id,
+            'measurement_type': measurement_type,
+            'count': len(values),
+            'gaps': detect_gaps(timestamps, max_gap).tolist(),
+        }
+        if not len(values):
+            return report
+        report.update(min=float(values.min()), max=float(values.max()), mean=float(values.mean()),
+                      std=float(values.std()))
+        rates = rate_of_change(timestamps, values)
+        if numpy.any(~numpy.isnan(rates)):
+            report['max_rate_of_change'] = float(numpy.nanmax(numpy.abs(rates)))
+        # Value is compared with statistics of the window before it
+        previous_means = numpy.insert(rolling_mean(values, window)[:-1], 0, numpy.nan)
+        previous_stds = numpy.insert(rolling_std(values, window)[:-1], 0, numpy.nan)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            deviations = numpy.abs(values - previous_means) / previous_stds
+        deviations[~numpy.isfinite(deviations)] = numpy.nan
+        if numpy.any(~numpy.isnan(deviations)):
+            report['max_deviation'] = float(numpy.nanmax(deviations))
+        return report
+
+    @classmethod
+    def get_fleet_report(cls, measurement_type: str, start_timestamp: int, end_timestamp: int, window: int = 10,
+                         max_gap: int = 60 * 1000, max_workers: int = None) -> t.List[dict]:
+        """ Reports (see `get_report`) of all devices, series of devices are loaded concurrently """
+        device_ids = [device.device_id for device in DeviceService.iter_all()]
+        # botocore doesn't allow to create client safely from multiple threads
+        init_connection(MeasurementModel)
+        with ThreadPoolExecutor(max_workers=max_workers or SCAN_WORKERS) as executor:
+            return list(executor.map(
+                lambda device_id: cls.get_report(device_id, measurement_type, start_timestamp, end_timestamp,
+                                                 window, max_gap),
+                device_ids))
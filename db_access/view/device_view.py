@@ -1,9 +1,9 @@
-from typing import Dict, Union, List
+from typing import Dict, Union, List, Iterator
 
 from common.errors import ItemDoesNotExist
-from model.measurement_model import MeasurementModel
+from model.measurement_model import MeasurementModel, LatestMeasurementModel, MeasurementRollupModel
 from service.device_service import DeviceService
-from service.measurement_service import MeasurementService
+from service.measurement_service import MeasurementService, LatestMeasurementService, MeasurementRollupService
 from view.base_view import BaseView
 
 
@@ -17,20 +17,9 @@ class DeviceView(BaseView):
         return measurements_with_value
 
     @classmethod
-    def get_all_devices_with_last_measurement_and_time(cls) -> Dict[str, Union[MeasurementModel, None]]:
-        devices_with_measurement = {}
-        devices = DeviceService.get_all()
-        for device_id in devices:
-            device_id = device_id.device_id
-            newest_measurements = cls.get_newest_measurements_for_device(
-                device_id=device_id,
-                max_number_of_measurements=1)
-            if not newest_measurements:
-                newest_measurement_value = None
-            else:
-                newest_measurement_value = newest_measurements[0]
-            devices_with_measurement[device_id] = newest_measurement_value
-        return devices_with_measurement
+    def get_all_devices_with_last_measurement_and_time(cls) -> Dict[str, Union[LatestMeasurementModel, None]]:
+        newest_measurements = LatestMeasurementService.get_newest_measurement_for_all_devices()
+        return {device.device_id: newest_measurements.get(device.device_id) for device in DeviceService.iter_all()}
 
     @classmethod
     def get_newest_measurements_for_device(cls, device_id, max_number_of_measurements=3) -> List[MeasurementModel]:
@@ -40,14 +29,22 @@ class DeviceView(BaseView):
         return MeasurementService.get_latest(hash_key=device_id, limit=max_number_of_measurements)
 
     @staticmethod
-    def get_measurements_for_device_for_time_range(device_id,
-                                                   start_timestamp,
-                                                   end_timestamp,
-                                                   max_number_of_measurements=10):
-        return MeasurementService.scan(
-            limit=max_number_of_measurements,
-            filter_condition=(
-                    (MeasurementModel.device_id == device_id)
-                    &
-                    (MeasurementModel.timestamp.between(start_timestamp, end_timestamp))
-            ))
+    def get_measurements_for_device_for_time_range(
+            device_id,
+            start_timestamp,
+            end_timestamp,
+            max_number_of_measurements=10,
+            resolution=None) -> Iterator[Union[MeasurementModel, MeasurementRollupModel]]:
+        """
+        Stream measurements of device from time range. If `resolution` (in milliseconds) is given, they are read
+        from the coarsest rollup, which buckets aren't wider than it. Rollups have `value` (average) too
+        """
+        rollup_model_class = MeasurementRollupService.get_rollup_model(resolution) if resolution else None
+        if rollup_model_class is not None:
+            return MeasurementRollupService.iter_rollups(
+                rollup_model_class, device_id, start_timestamp, end_timestamp, limit=max_number_of_measurements)
+        return MeasurementService.iter_measurements_for_device(
+            device_id=device_id,
+            start_timestamp=start_timestamp,
+            end_timestamp=end_timestamp,
+            limit=max_number_of_measurements)
@@ -0,0 +1,143 @@
+import typing as t
+
+from service.measurement_service import MeasurementService
+from view.base_view import BaseView
+
+AGGREGATION_FUNCTIONS = ('avg', 'min', 'max', 'sum', 'count', 'first', 'last')
+
+Point = t.Tuple[float, float]  # (timestamp, value)
+
+
+class BucketAggregate:
+    """ Running aggregate of values from single time bucket, it doesn't keep the values themselves """
+    __slots__ = ('count', 'sum', 'min', 'max', 'first', 'last')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+        self.first = None
+        self.last = None
+
+    def add(self, value: float):
+        if self.count == 0:
+            self.min = self.max = self.first = value
+        else:
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        self.last = value
+        self.sum += value
+        self.count += 1
+
+    def get(self, function: str) -> float:
+        if function == 'avg':
+            return self.sum / self.count
+        return getattr(self, function)
+
+
+def _get_average_point(points: t.List[Point]) -> Point:
+    return sum(point[0] for point in points) / len(points), sum(point[1] for point in points) / len(points)
+
+
+def _select_lttb_point(previous_point: Point, points: t.List[Point], next_point: Point) -> Point:
+    """ Select point, which makes triangle of the largest area with previously selected point and the next one """
+    def triangle_area(point: Point) -> float:
+        return abs((previous_point[0] - next_point[0]) * (point[1] - previous_point[1])
+                   - (previous_point[0] - point[0]) * (next_point[1] - previous_point[1]))
+    return max(points, key=triangle_area)
+
+
+def iter_lttb(points: t.Iterable[Point], start_timestamp: float, end_timestamp: float,
+              threshold: int) -> t.Iterator[Point]:
+    """
+    Downsample time ordered points with Largest-Triangle-Three-Buckets to at most `threshold` points.
+    Buckets have equal width in time (not in number of points), so points are streamed
+    and only two buckets are kept in memory at once. First and last point are always kept
+    """
+    buckets_count = max(threshold - 2, 1)
+    width = max((end_timestamp - start_timestamp) / buckets_count, 1)
+    points = iter(points)
+    selected_point = next(points, None)
+    if selected_point is None:
+        return
+    yield selected_point
+
+    pending_bucket = []  # Complete bucket, waiting for average of the next one to select its point
+    current_bucket = []
+    current_bucket_number = None
+    for point in points:
+        # Point at `end_timestamp` would start bucket of its own, so it belongs to the last one
+        bucket_number = min(int((point[0] - start_timestamp) // width), buckets_count - 1)
+        if bucket_number != current_bucket_number and current_bucket:
+            if pending_bucket:
+                selected_point = _select_lttb_point(selected_point, pending_bucket, _get_average_point(current_bucket))
+                yield selected_point
+            pending_bucket, current_bucket = current_bucket, []
+        current_bucket_number = bucket_number
+        current_bucket.append(point)
+
+    if not current_bucket:
+        return
+    last_point = current_bucket.pop()
+    if pending_bucket:
+        next_point = _get_average_point(current_bucket) if current_bucket else last_point
+        selected_point = _select_lttb_point(selected_point, pending_bucket, next_point)
+        yield selected_point
+    if current_bucket:
+        yield _select_lttb_point(selected_point, current_bucket, last_point)
+    yield last_point
+
+
+class MeasurementView(BaseView):
+
+    @staticmethod
+    def iter_aggregated_measurements(device_id: str, start_timestamp: int, end_timestamp: int, bucket_size: int,
+                                     functions: t.Sequence[str] = ('avg',),
+                                     measurement_type: str = None) -> t.Iterator[dict]:
+        """
+        Stream measurements of device aggregated into time buckets of `bucket_size` milliseconds,
+        separately for each measurement type. Measurements are read oldest first, so each bucket is
+        complete as soon as the first measurement of the next one arrives, which keeps memory constant.
+        Yields {measurement_type, timestamp (start of bucket), <function>: value, ...} ordered by timestamp
+        """
+        unknown_functions = set(functions) - set(AGGREGATION_FUNCTIONS)
+        if unknown_functions:
+            raise ValueError(f"Unknown aggregation functions: {', '.join(sorted(unknown_functions))}")
+
+        def get_bucket_rows(bucket_timestamp: int, aggregates: t.Dict[str, BucketAggregate]) -> t.Iterator[dict]:
+            for aggregated_type, aggregate in sorted(aggregates.items()):
+                row = {'measurement_type': aggregated_type, 'timestamp': bucket_timestamp}
+                row.update((function, aggregate.get(function)) for function in functions)
+                yield row
+
+        current_bucket_timestamp = None
+        aggregates = {}  # type: t.Dict[str, BucketAggregate]
+        # Type is filtered by DynamoDB, so measurements of other types aren't transferred at all
+        filter_condition = None
+        if measurement_type is not None:
+            filter_condition = MeasurementService.model_class.measurement_type == measurement_type
+        measurements = MeasurementService.iter_measurements_for_device(device_id, start_timestamp, end_timestamp,
+                                                                       filter_condition=filter_condition)
+        for measurement in measurements:
+            bucket_timestamp = int(measurement.timestamp - measurement.timestamp % bucket_size)
+            if bucket_timestamp != current_bucket_timestamp:
+                yield from get_bucket_rows(current_bucket_timestamp, aggregates)
+                current_bucket_timestamp = bucket_timestamp
+                aggregates = {}
+            aggregates.setdefault(measurement.measurement_type, BucketAggregate()).add(measurement.value)
+        yield from get_bucket_rows(current_bucket_timestamp, aggregates)
+
+    @staticmethod
+    def iter_downsampled_measurements(device_id: str, start_timestamp: int, end_timestamp: int, threshold: int,
+                                      measurement_type: str) -> t.Iterator[dict]:
+        """
+        Stream measurements of selected type of device downsampled with LTTB (see `iter_lttb`)
+        to at most `threshold` points, which keep visual shape of the series on charts
+        """
+        measurements = MeasurementService.iter_measurements_for_device(
+            device_id, start_timestamp, end_timestamp,
+            filter_condition=MeasurementService.model_class.measurement_type == measurement_type)
+        points = ((measurement.timestamp, measurement.value) for measurement in measurements)
+        for timestamp, value in iter_lttb(points, start_timestamp, end_timestamp, threshold):
+            yield {'measurement_type': measurement_type, 'timestamp': timestamp, 'value': value}
@@ -5,15 +5,22 @@ import requests
 from db_access import MeasurementService, DeviceService
 
 
-FOUR_HOURS_AGO = time.time() - (60 * 60 * 4)
-FOUR_DAYS_AGO = time.time() - (60 * 60 * 24 * 4)
+FOUR_HOURS = 60 * 60 * 4
+FOUR_DAYS = 60 * 60 * 24 * 4
 
+# Session keeps connection to visualization alive between invocations of warm container
+http_session = requests.Session()
 
-def was_any_measurement_sent_recently(break_point_timestamp: float = FOUR_HOURS_AGO):
-    measurements = MeasurementService.model_class.scan(limit=1)
-    measurement = measurements.next()
-    return measurement.timestamp > break_point_timestamp
+
+def was_any_measurement_sent_recently(break_point_timestamp: float = None):
+    # Module is loaded only once per container, so default break point is computed on each call
+    if break_point_timestamp is None:
+        break_point_timestamp = time.time() - FOUR_HOURS
+    # Measurements timestamps are stored in milliseconds, stop reading as soon as first one is found
+    measurements = MeasurementService.iter_measurements_for_time_range(
+        start_timestamp=break_point_timestamp * 1000, end_timestamp=time.time() * 1000, limit=1)
+    return next(measurements, None) is not None
 
 def is_visualization_okay(url: str):
-    with requests.get(url) as response:
+    with http_session.get(url) as response:
         return response.status_code == 200
\ No newline at end of file
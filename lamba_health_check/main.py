@@ -1,17 +1,18 @@
 import logging
 import datetime
-import os
 
-import boto3
+from checks import was_any_measurement_sent_recently, is_visualization_okay
+from common.lambda_runtime import init_connections, start_invocation
+from model.measurement_model import MeasurementModel
 
-from checks import is_any_battery_status_was_sent_recently, is_any_measurement_was_sent_recently, is_visualization_okay
+# Sentry and DynamoDB connections are initialised once per container and reused by warm invocations
+init_connections(MeasurementModel)
 
 
 def main(*args, **kwargs):
-    logging.info("Datetime: ", datetime.datetime.utcnow().strftime("%d/%m/%y %H:%M:%S"))
-    if not is_any_battery_status_was_sent_recently():
-        raise Exception("Check failed: " + is_any_battery_status_was_sent_recently.__name__)
-    if not is_any_measurement_was_sent_recently():
-        raise Exception("Check failed: " + is_any_measurement_was_sent_recently.__name__)
+    start_invocation(args[0] if args else {})
+    logging.info(f"Datetime: {datetime.datetime.utcnow().strftime('%d/%m/%y %H:%M:%S')}")
+    if not was_any_measurement_sent_recently():
+        raise Exception("Check failed: " + was_any_measurement_sent_recently.__name__)
     if not is_visualization_okay("https://iot-demo.wizzdev.pl"):
         raise Exception("Check failed: " + is_visualization_okay.__name__)
@@ -1,34 +1,185 @@
+import base64
+import collections
+import hashlib
+import json
 import logging
+import math
+import numbers
 import os
+import typing as t
 
 import sentry_sdk
 
+from common.cache import RecentKeysCache
+from common.errors import BatchWriteError
+from common.lambda_runtime import init_connections, start_invocation
+from service.batch_writer import BatchWriteReport
 from db_access.service.measurement_service import MeasurementService
+from model.measurement_model import MeasurementModel, MeasurementTypeModel, LatestMeasurementModel, \
+    MinuteRollupModel, HourRollupModel, DayRollupModel
+
+# Sentry and DynamoDB connections are initialised once per container and reused by warm invocations
+init_connections(MeasurementModel, MeasurementTypeModel, LatestMeasurementModel,
+                 MinuteRollupModel, HourRollupModel, DayRollupModel)
+
+# Hashes of payloads already written by this container, used to drop redelivered messages without parsing them
+DEDUPLICATE_PAYLOADS = os.environ.get('DEDUPLICATE_PAYLOADS', 'true').lower() not in ('false', '0', 'no', 'off')
+recent_payloads = RecentKeysCache(max_size=int(os.environ.get('PAYLOAD_DEDUPLICATION_CACHE_SIZE', 10000)))
+
+
+def get_payload_hash(payload: dict) -> str:
+    content = json.dumps([payload['client_id'], payload['data']], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def is_valid_number(number) -> bool:
+    """
+    Whether number can be stored by DynamoDB: finite, up to 38 digits and within 1e-130 to 1e125 in magnitude.
+    JSON booleans are parsed as bool, which is a Number too, so they are excluded explicitly
+    """
+    if isinstance(number, bool) or not isinstance(number, numbers.Real):
+        return False
+    if isinstance(number, numbers.Integral):
+        return abs(number) < 10 ** 38
+    return math.isfinite(number) and (number == 0 or 1e-130 <= abs(number) < 1e125)
+
+
+def flatten_measurements(device_id: str, data: dict) -> t.Tuple[t.List[dict], t.List[tuple]]:
+    """
+    Flatten measurements of all types from payload into single list of rows, so they are written together.
+    Returns valid rows and malformed (measurement_type, raw row) pairs, which were rejected.
+    Rows without device id or measurement type and rows with non-numeric, boolean or non-finite (NaN, Infinity)
+    timestamp or value can never be written (and would fail whole batch), so they are rejected as well
+    """
+    measurements = []
+    rejected_rows = []
+    for measurement_type, measurement_raws in data.items():
+        for measurement_raw in measurement_raws:
+            if not device_id or not isinstance(device_id, str) or not measurement_type:
+                rejected_rows.append((measurement_type, measurement_raw))
+                continue
+            try:
+                timestamp, value = measurement_raw
+            except (TypeError, ValueError):
+                rejected_rows.append((measurement_type, measurement_raw))
+                continue
+            if not is_valid_number(timestamp) or not is_valid_number(value):
+                rejected_rows.append((measurement_type, measurement_raw))
+                continue
+            measurements.append({
+                'device_id': device_id,
+                'timestamp': timestamp,
+                'value': value,
+                'measurement_type': measurement_type
+            })
+    return measurements, rejected_rows
+
+
+def write_measurements(measurements: t.List[dict]) -> BatchWriteReport:
+    """ Add measurements to database in single batch, measurements which couldn't be written are listed in report """
+    if not measurements:
+        return BatchWriteReport()
+    try:
+        report = MeasurementService.create_measurements(measurements)
+    except BatchWriteError as exception:
+        report = exception.report
+        for measurement in report.failed_items:
+            logging.error(f"Measurement could not be added to database: {measurement}")
+        for measurement in report.rejected_items:
+            logging.error(f"Invalid measurement rejected by database: {measurement}")
+        sentry_sdk.capture_exception(exception)
+    except Exception as exception:
+        logging.exception(f"Exception occurred while adding measurements to database: {exception}")
+        sentry_sdk.capture_exception(exception)
+        report = BatchWriteReport()
+        report.failed_items = measurements
+    if report.duplicates_count:
+        logging.info(f"Dropped {report.duplicates_count} already written measurements")
+    if report.collapsed_items:
+        logging.info(f"Dropped {len(report.collapsed_items)} measurements replaced by later ones with the same key")
+    return report
 
 
 def main(*args, **kwargs):
-    # init sentry
-    sentry_dsn = os.environ.get('SENTRY')
-    if sentry_dsn:
-        sentry_sdk.init(sentry_dsn, environment=os.environ.get("MODE", "undefined"))
-        sentry_sdk.add_breadcrumb(args[0])
+    """ Handler of single MQTT message ({client_id, data}) forwarded by IoT topic rule """
+    start_invocation(args[0])
 
     payload = args[0]
     device_id = payload['client_id']
 
-    # Add measurements to database
-    for measurement_type, measurement_raws in payload['data'].items():
-        measurements = []
+    payload_hash = get_payload_hash(payload) if DEDUPLICATE_PAYLOADS else None
+    if payload_hash and payload_hash in recent_payloads:
+        logging.info(f"Dropped already written message of device {device_id}")
+        duplicates_count = sum(len(measurement_raws) for measurement_raws in payload['data'].values())
+        return {'written': 0, 'failed': 0, 'rejected': 0, 'duplicates': duplicates_count, 'collapsed': 0}
+
+    measurements, rejected_rows = flatten_measurements(device_id, payload['data'])
+    for measurement_type, measurement_raw in rejected_rows:
+        logging.error(f"Rejected malformed measurement of device {device_id}: {measurement_type}, {measurement_raw}")
+
+    # Add measurements of all types to database in single batch
+    report = write_measurements(measurements)
+    if payload_hash and not report.failed_items:
+        recent_payloads.add(payload_hash)
+
+    return {
+        'written': report.written_count,
+        'failed': len(report.failed_items),
+        'rejected': len(rejected_rows) + len(report.rejected_items),
+        'duplicates': report.duplicates_count,
+        'collapsed': len(report.collapsed_items),
+    }
+
+
+def read_batch_record(record: dict) -> t.Tuple[str, dict]:
+    """ Returns identifier and {client_id, data} payload of SQS or Kinesis record """
+    if 'kinesis' in record:
+        return record['kinesis']['sequenceNumber'], json.loads(base64.b64decode(record['kinesis']['data']))
+    return record['messageId'], json.loads(record['body'])
+
+
+def batch_main(event, context=None):
+    """
+    Handler of batch of messages delivered by SQS or Kinesis, each record wraps payload handled by `main`.
+    Measurements from all records are written together, identifiers of records which couldn't be
+    (fully) written are returned as partial batch failures, so only they are delivered again.
+    Malformed records and invalid measurements would fail again on every delivery, so they are only reported
+    """
+    start_invocation({'records': len(event.get('Records', []))})
+
+    failed_record_ids = []
+    record_ids_by_measurement_key = {}
+    payload_hashes_by_record_id = {}
+    measurements = []
+    for record in event.get('Records', []):
         try:
-            for timestamp, value in measurement_raws:
-                measurements.append({
-                    'device_id': device_id,
-                    'timestamp': timestamp,
-                    'value': value,
-                    'measurement_type': measurement_type
-                })
-            MeasurementService.create_measurements(measurements)
-        except Exception as exception:
-            logging.exception(f"Exception occurred while adding measurements to database: {exception} "
-                              f"\n Inputs: {measurement_type}, {measurement_raws}")
+            record_id, payload = read_batch_record(record)
+            device_id = payload['client_id']
+            if DEDUPLICATE_PAYLOADS:
+                payload_hash = get_payload_hash(payload)
+                if payload_hash in recent_payloads:
+                    logging.info(f"Dropped already written message of device {device_id}")
+                    continue
+                payload_hashes_by_record_id[record_id] = payload_hash
+            record_measurements, rejected_rows = flatten_measurements(device_id, payload['data'])
+        except (KeyError, TypeError, AttributeError, ValueError) as exception:
+            # Redelivery can't fix malformed record, so it's dropped instead of blocking queue or shard
+            logging.exception(f"Dropped malformed batch record: {record}")
             sentry_sdk.capture_exception(exception)
+            continue
+        for measurement_type, measurement_raw in rejected_rows:
+            logging.error(f"Rejected malformed measurement of device {device_id}: "
+                          f"{measurement_type}, {measurement_raw}")
+        for measurement in record_measurements:
+            key = (measurement['device_id'], measurement['measurement_type'], measurement['timestamp'])
+            record_ids_by_measurement_key.setdefault(key, []).append(record_id)
+        measurements.extend(record_measurements)
+
+    for measurement in write_measurements(measurements).failed_items:
+        key = (measurement['device_id'], measurement['measurement_type'], measurement['timestamp'])
+        failed_record_ids.extend(record_ids_by_measurement_key.get(key, []))
+
+    unique_failed_record_ids = list(collections.OrderedDict.fromkeys(failed_record_ids))
+    recent_payloads.update(payload_hash for record_id, payload_hash in payload_hashes_by_record_id.items()
+                           if record_id not in unique_failed_record_ids)
+    return {'batchItemFailures': [{'itemIdentifier': record_id} for record_id in unique_failed_record_ids]}
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Lambda package contains db_access and its packages next to handler (see terraform/scripts/build_lambda.py)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path[:0] = [os.path.join(ROOT_DIR, 'db_access'), ROOT_DIR, os.path.join(ROOT_DIR, 'lambda_collect_measurements')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
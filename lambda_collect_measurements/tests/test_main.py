@@ -0,0 +1,47 @@
+import json
+
+import pytest
+
+from main import flatten_measurements
+
+
+def test_valid_measurements_are_flattened():
+    measurements, rejected_rows = flatten_measurements('device', {'temperature': [[1, 21.5], [2, -3]]})
+    assert measurements == [
+        {'device_id': 'device', 'timestamp': 1, 'value': 21.5, 'measurement_type': 'temperature'},
+        {'device_id': 'device', 'timestamp': 2, 'value': -3, 'measurement_type': 'temperature'},
+    ]
+    assert rejected_rows == []
+
+
+@pytest.mark.parametrize('measurement_raw', [
+    [1, True],
+    [False, 1],
+    [1, float('nan')],
+    [1, float('inf')],
+    [float('-inf'), 1],
+    [1, 10 ** 38],
+    [1, 1e200],
+    [1, 1e-200],
+    [1, '1'],
+    [1, None],
+])
+def test_invalid_number_is_rejected(measurement_raw):
+    measurements, rejected_rows = flatten_measurements('device', {'temperature': [[2, 1], measurement_raw]})
+    assert [measurement['timestamp'] for measurement in measurements] == [2]
+    assert rejected_rows == [('temperature', measurement_raw)]
+
+
+@pytest.mark.parametrize('payload_data', ['[1, NaN]', '[1, Infinity]', '[1, -Infinity]', '[1, 1e400]', '[1, true]'])
+def test_invalid_json_number_is_rejected(payload_data):
+    measurements, rejected_rows = flatten_measurements('device', {'temperature': [json.loads(payload_data)]})
+    assert measurements == []
+    assert len(rejected_rows) == 1
+
+
+@pytest.mark.parametrize('device_id, measurement_type', [(None, 'temperature'), ('', 'temperature'), (1, 'temperature'),
+                                                         ('device', '')])
+def test_row_without_device_id_or_type_is_rejected(device_id, measurement_type):
+    measurements, rejected_rows = flatten_measurements(device_id, {measurement_type: [[1, 2]]})
+    assert measurements == []
+    assert rejected_rows == [(measurement_type, [1, 2])]
@@ -13,6 +13,8 @@ import logging
 # Set up path to db access library
 # This is a package that standardize using of database in iot-project
 DB_ACCESS_LIBRARY_PATH = pathlib.Path(os.path.dirname(__file__), '..', '..', 'db_access').absolute()
+# Directories, which are not deployed with lambda
+EXCLUDED_DIRS = ("tests",)
 
 
 def parse_args():
@@ -74,8 +76,11 @@ def install_requirements(src_dir_path: str, build_dir_path: str, add_db_access:
         if os.path.isfile(db_access_requirements_txt_path):
             subprocess.check_call(["pip", "install", "-r", str(db_access_requirements_txt_path), "--target", str(build_dir_path), "-qqq"])
         db_access_dir_name = os.path.basename(DB_ACCESS_LIBRARY_PATH)
-        shutil.copytree(DB_ACCESS_LIBRARY_PATH, os.path.join(build_dir_path, db_access_dir_name))
+        shutil.copytree(DB_ACCESS_LIBRARY_PATH, os.path.join(build_dir_path, db_access_dir_name),
+                        ignore=shutil.ignore_patterns(*EXCLUDED_DIRS))
         for entry in os.scandir(DB_ACCESS_LIBRARY_PATH):
+            if entry.name in EXCLUDED_DIRS:
+                continue
             if entry.is_dir():
                 shutil.copytree(entry.path, os.path.join(build_dir_path, entry.name))
             elif entry.is_file():
@@ -90,6 +95,8 @@ def copy_lambda_code(src_dir_path: str, build_dir_path: str):
     """
     logging.info("Copy lambda code")
     for entry in os.scandir(src_dir_path):
+        if entry.name in EXCLUDED_DIRS:
+            continue
         if entry.is_dir():
             shutil.copytree(entry.path, os.path.join(build_dir_path, entry.name))
         elif entry.is_file():
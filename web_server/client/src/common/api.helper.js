@@ -14,14 +14,15 @@ export default class ApiHelper {
     * queryParams: {name=value} - get arguments
     * suffix: string - added to url after base url
     * skipError: boolean - do not toast error message
+    * Paginated responses are followed with 'cursor' param until API stops returning 'next_cursor'
     */
     async getList (context, action, options) {
         options = (options || {});
         let url = Configuration.API_BASE_URL + this.base_url + (options.suffix || "");
-        axios.get(url, {params: (options.queryParams)})
-            .then(response => {
-                context.commit(action, ApiHelper.normalizeData(response.data['data']));
-                return response.data['data'];
+        ApiHelper.getAllPages(url, options.queryParams)
+            .then(items => {
+                context.commit(action, ApiHelper.normalizeData(items));
+                return items;
             })
             .catch(error => {
                 if (options.skipError !== true) this.toastApiError(undefined, error);
@@ -49,6 +50,19 @@ export default class ApiHelper {
             });
     }
 
+    /* Gather items from all pages of paginated list endpoint */
+    static async getAllPages (url, queryParams) {
+        let items = [];
+        let cursor = undefined;
+        do {
+            let params = Object.assign({}, queryParams, cursor ? {cursor: cursor} : {});
+            let response = await axios.get(url, {params: params});
+            items = items.concat(response.data['data']);
+            cursor = response.data['next_cursor'];
+        } while (cursor);
+        return items;
+    }
+
     /* Create notification for user about error */
     toastApiError (message, error) {
         Vue.toasted.error(
@@ -0,0 +1,41 @@
+"""
+Compare serialization of measurement lists: marshmallow with `flask.jsonify` (previous path) against
+direct serializer with the fastest available JSON backend, both as a single body and streamed.
+Measurements are created in memory, so database is not needed. Run from `web_server/server` directory
+with `db_access` in path: `python ../misc/benchmark_serialization.py [rows]`
+"""
+import sys
+import time
+
+import flask
+
+from core.response_factory import create_success_response, create_streamed_response, dumps
+from serializers.measurement_serializer import MeasurementSerializer, serialize_measurement
+from model.measurement_model import MeasurementModel
+
+rows_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+measurements = [
+    MeasurementModel(device_id=f"dev_{i % 10}", timestamp=1600000000000 + i * 1000,
+                     measurement_type=f"measurement_type_{i % 3}", value=i % 100 / 10)
+    for i in range(rows_count)
+]
+measurement_schema = MeasurementSerializer()
+app = flask.Flask(__name__)
+
+
+def benchmark(name: str, create_response):
+    start = time.perf_counter()
+    response = create_response()
+    body_size = sum(len(chunk) for chunk in response.response)
+    print(f"{name:<46} {time.perf_counter() - start:8.3f} s {body_size / 1024 / 1024:8.1f} MiB")
+
+
+with app.test_request_context():
+    print(f"{rows_count} measurements, JSON backend: {dumps.__name__.strip('_').replace('_dumps', '')}")
+    benchmark("marshmallow + flask.jsonify",
+              lambda: flask.jsonify({'data': measurement_schema.serialize(measurements, many=True),
+                                     'status': 200, 'status_text': "OK"}))
+    benchmark("direct serializer + create_success_response",
+              lambda: create_success_response(data=[serialize_measurement(m) for m in measurements]))
+    benchmark("direct serializer + create_streamed_response",
+              lambda: create_streamed_response(data=map(serialize_measurement, measurements)))
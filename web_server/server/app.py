@@ -9,6 +9,7 @@ import marshmallow
 import pynamodb.exceptions
 from flask_jwt_extended import JWTManager
 
+import core.compression
 import core.response_factory
 import config
 import common.errors
@@ -66,6 +67,26 @@ def handle_all_exceptions(error):
     return core.response_factory.create_failed_response(status_text=str(error))
 
 
+# Functions registered by `after_request` are called in reverse order, so this one is called as the last one
+@app.after_request
+def compress_response(response: flask.Response):
+    # flask_lambda can't return binary body to API Gateway, responses served by lambda are left uncompressed
+    if not config.COMPRESSION or flask.request.aws_event is not None or not core.compression.is_compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < http.HTTPStatus.OK.value or response.status_code in (
+            http.HTTPStatus.NO_CONTENT.value, http.HTTPStatus.PARTIAL_CONTENT.value, http.HTTPStatus.NOT_MODIFIED.value)
+            or 'Content-Encoding' in response.headers):
+        return response
+    # Length of streamed responses is unknown, they are expected to be large
+    if response.content_length is not None and response.content_length < config.COMPRESSION_MIN_SIZE:
+        return response
+    encoding = core.compression.select_encoding(flask.request)
+    if encoding:
+        core.compression.compress_response(response, encoding, config.COMPRESSION_LEVEL)
+    return response
+
+
 @app.after_request
 def add_no_robots_html_header(response: flask.Response):
     if config.NO_ROBOTS:
@@ -75,6 +96,14 @@ def add_no_robots_html_header(response: flask.Response):
     return response
 
 
+@app.after_request
+def join_streamed_response_for_lambda(response: flask.Response):
+    # API Gateway can't stream, flask_lambda passes on only the first chunk of response, so chunks are joined
+    if response.is_streamed and flask.request.aws_event is not None:
+        response.set_data(response.get_data())
+    return response
+
+
 @app.route('/')
 def get_website() -> flask.Response:
     return flask.send_file(os.path.join("client", "index.html"))
@@ -3,6 +3,16 @@ import os
 
 SECRET_KEY = os.environ.get("SECRET_KEY", "secretX@0486791020945248")
 PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 15))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))  # Max items of lists returned per request
+MEASUREMENT_PAGE_SIZE = int(os.environ.get('MEASUREMENT_PAGE_SIZE', 500))  # Max measurements returned per request
+MAX_AGGREGATION_BUCKETS = int(os.environ.get('MAX_AGGREGATION_BUCKETS', 10000))  # Max time buckets per aggregation
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory').lower()  # Cache of metadata responses: memory, redis or none
+CACHE_TTL = float(os.environ.get('CACHE_TTL', 60))  # Seconds, after which cached response expires
+CACHE_MAX_SIZE = int(os.environ.get('CACHE_MAX_SIZE', 1024))  # Max number of responses in memory cache
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+COMPRESSION = os.environ.get('COMPRESSION', 'true').lower() not in ('false', '0', 'no', 'off')  # gzip/brotli responses
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # Smaller responses (in bytes) aren't compressed
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))  # gzip level (1-9) or brotli quality (0-11)
 NO_ROBOTS = bool(os.environ.get('NO_ROBOTS', True))  # Define if page should be indexed
 CORS = bool(os.environ.get('CORS', True))
 ENV_LOGIN = os.environ.get('ESP_HARD_LOGIN', 'DEBUG_LOGIN')
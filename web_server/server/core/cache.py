@@ -0,0 +1,196 @@
+"""
+Read-through cache of GET responses of rarely changing entities (devices, device types, device groups,
+measurement types). Responses are cached per namespace, view, url arguments and query arguments (page token
+and limit included) and namespace is invalidated by POST/PUT/DELETE handlers of its entities.
+
+Invalidation doesn't remove cached responses, it bumps version of namespace, which is part of cache keys,
+so it's a single operation on any backend and stale responses just expire (see CACHE_TTL).
+In-process backend is invalidated only in process, which handled the change, so with many server instances
+(e.g. lambda containers) use Redis backend or keep CACHE_TTL short
+"""
+import collections
+import functools
+import logging
+import threading
+import time
+import typing
+from http import HTTPStatus
+
+import flask
+
+import config
+from core.etag import create_conditional_response
+
+try:
+    import redis
+except ImportError:  # Redis is optional, it's needed only by CACHE_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'iot-api'
+
+
+class MemoryCacheBackend:
+    """ In-process, thread-safe LRU cache, which entries expire after `ttl` seconds """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()  # type: typing.Dict[str, typing.Tuple[float, bytes]]
+        self._counters = {}  # type: typing.Dict[str, int]
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_counter(self, key: str) -> int:
+        # Counters are kept apart from entries, so they are never evicted (it would make old entries valid again)
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisCacheBackend:
+    """ Cache in Redis (or any server speaking its protocol), `client` is redis-py compatible client """
+
+    def __init__(self, client, ttl: float):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: float) -> 'RedisCacheBackend':
+        if redis is None:
+            raise ImportError("CACHE_BACKEND=redis requires redis package, install it or use other backend")
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        return self.client.get(key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(key, value, ex=max(int(self.ttl), 1))
+
+    def get_counter(self, key: str) -> int:
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(key)
+
+
+class ResponseCache:
+    """ Cache of ETags and serialized JSON bodies of successful responses on top of backend """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def get_key(self, namespace: str, view: str) -> typing.Optional[str]:
+        """ Key of response of current request, None if cache is unavailable """
+        try:
+            version = self.backend.get_counter(self._get_version_key(namespace))
+        except Exception as exception:
+            # Unavailable cache must not fail requests, they are just served from database
+            logger.warning(f"Cannot read version of {namespace} from cache: {exception}")
+            return None
+        query = '&'.join(f'{name}={value}' for name, value in sorted(flask.request.args.items(multi=True)))
+        return f'{CACHE_KEY_PREFIX}:{namespace}:{version}:{view}:{flask.request.path}?{query}'
+
+    def get(self, key: str) -> typing.Optional[bytes]:
+        try:
+            return self.backend.get(key)
+        except Exception as exception:
+            logger.warning(f"Cannot read response from cache: {exception}")
+            return None
+
+    def set(self, key: str, value: bytes):
+        try:
+            self.backend.set(key, value)
+        except Exception as exception:
+            logger.warning(f"Cannot write response to cache: {exception}")
+
+    def invalidate(self, *namespaces: str):
+        for namespace in namespaces:
+            try:
+                self.backend.incr(self._get_version_key(namespace))
+            except Exception as exception:
+                logger.warning(f"Cannot invalidate cache of {namespace}: {exception}")
+
+    @staticmethod
+    def _get_version_key(namespace: str) -> str:
+        return f'{CACHE_KEY_PREFIX}:{namespace}:version'
+
+
+def create_cache_backend():
+    """ Create backend selected by CACHE_BACKEND, None if cache is disabled """
+    if config.CACHE_BACKEND == 'memory':
+        return MemoryCacheBackend(config.CACHE_MAX_SIZE, config.CACHE_TTL)
+    if config.CACHE_BACKEND == 'redis':
+        return RedisCacheBackend.from_url(config.CACHE_REDIS_URL, config.CACHE_TTL)
+    if config.CACHE_BACKEND in ('none', ''):
+        return None
+    raise ValueError(f"Unknown cache backend: {config.CACHE_BACKEND}, supported ones are: memory, redis, none")
+
+
+_backend = create_cache_backend()
+response_cache = ResponseCache(_backend) if _backend is not None else None
+
+
+def cached(namespace: str):
+    """ Serve GET handler from cache, only successful JSON responses (and their ETags) are cached """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = response_cache.get_key(namespace, function.__qualname__) if response_cache is not None else None
+            if key is None:
+                return function(*args, **kwargs)
+            entry = response_cache.get(key)
+            if entry is not None:
+                etag, _, body = entry.partition(b'\n')
+                if not etag:
+                    return flask.Response(body, status=HTTPStatus.OK.value, mimetype='application/json')
+                return create_conditional_response(
+                    etag.decode('ascii'),
+                    lambda: flask.Response(body, status=HTTPStatus.OK.value, mimetype='application/json'))
+            response = function(*args, **kwargs)
+            if (isinstance(response, flask.Response) and response.status_code == HTTPStatus.OK.value
+                    and response.is_json and not response.is_streamed):
+                # ETag is kept in front of body, so cached responses are conditional too
+                etag, _ = response.get_etag()
+                response_cache.set(key, (etag or '').encode('ascii') + b'\n' + response.get_data())
+            return response
+        return wrapper
+    return decorator
+
+
+def invalidates(*namespaces: str):
+    """ Invalidate cached responses of namespaces, after handler, which changes their entities """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                return function(*args, **kwargs)
+            finally:
+                # Also after failure, as it may have happened after the change
+                if response_cache is not None:
+                    response_cache.invalidate(*namespaces)
+        return wrapper
+    return decorator
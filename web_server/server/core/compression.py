@@ -0,0 +1,70 @@
+"""
+Compression of responses negotiated with `Accept-Encoding`: brotli (requires optional `brotli` package) or gzip.
+Streamed responses are compressed chunk by chunk, each chunk is flushed, so client can decode it right away
+"""
+import typing
+import zlib
+
+import flask
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, responses are compressed with gzip without it
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml')
+
+
+def select_encoding(request: flask.Request) -> typing.Optional[str]:
+    """ The best encoding accepted by client, brotli is preferred over gzip when both are equally accepted """
+    encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+    return request.accept_encodings.best_match(encodings)
+
+
+def is_compressible(response: flask.Response) -> bool:
+    return response.mimetype.startswith('text/') or response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+class _GzipCompressor:
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(max(1, min(level, 9)), zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def process(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def _create_compressor(encoding: str, level: int):
+    if encoding == 'br':
+        return brotli.Compressor(quality=max(0, min(level, 11)))
+    return _GzipCompressor(level)
+
+
+def _iter_compressed(chunks: typing.Iterable[bytes], encoding: str, level: int) -> typing.Iterator[bytes]:
+    compressor = _create_compressor(encoding, level)
+    for chunk in chunks:
+        compressed_chunk = compressor.process(chunk) + compressor.flush()
+        if compressed_chunk:
+            yield compressed_chunk
+    yield compressor.finish()
+
+
+def compress_response(response: flask.Response, encoding: str, level: int):
+    """ Compress body of response in place, streamed responses of unknown length stay streamed """
+    response.direct_passthrough = False  # Files sent with `flask.send_file` are read and compressed too
+    if response.is_streamed and response.content_length is None:
+        response.response = _iter_compressed(response.iter_encoded(), encoding, level)
+    else:
+        compressor = _create_compressor(encoding, level)
+        response.set_data(compressor.process(response.get_data()) + compressor.finish())
+    response.headers['Content-Encoding'] = encoding
+    # Compressed body is a different representation, so it can't keep strong validator of the original one
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak:
+        response.set_etag(etag, weak=True)
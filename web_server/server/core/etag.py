@@ -0,0 +1,45 @@
+"""
+Conditional GET of entities. ETag is derived from keys and `modified_at` of items (updated by every
+`AuditModel.save`), so it's known before items are serialized and unchanged polls, which send it back
+in `If-None-Match`, get `304 Not Modified` without serialization and body
+"""
+import hashlib
+import json
+import typing
+from http import HTTPStatus
+
+import flask
+
+from model.base_model import Model
+
+
+def _get_item_state(item: Model):
+    modified_at = item.attribute_values.get('modified_at')
+    if modified_at is None:
+        # Items without audit attributes are identified by their whole content
+        return item.attribute_values
+    return item.attribute_values.get(item._hash_key_attribute().attr_name), modified_at
+
+
+def get_etag(items: typing.Union[Model, typing.Iterable[Model]]) -> str:
+    """ Strong ETag of item or list of items, it changes when any of them is saved, added or removed """
+    if isinstance(items, Model):
+        items = [items]
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(json.dumps(_get_item_state(item), sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def create_conditional_response(etag: str, create_response: typing.Callable[[], flask.Response]) -> flask.Response:
+    """
+    Return `304 Not Modified`, if client already has representation with `etag` (see `If-None-Match`),
+    otherwise response created by `create_response` with ETag header
+    """
+    # Weak comparison, as compression makes ETags of compressed responses weak
+    if flask.request.if_none_match.contains_weak(etag):
+        response = flask.Response(status=HTTPStatus.NOT_MODIFIED.value)
+    else:
+        response = create_response()
+    response.set_etag(etag)
+    return response
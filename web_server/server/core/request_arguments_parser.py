@@ -2,4 +2,6 @@ from flask_restx.reqparse import RequestParser
 
 core_request_arguments_parser = RequestParser()
 core_request_arguments_parser.add_argument("limit", type=int, location="args")
+core_request_arguments_parser.add_argument("cursor", type=str, location="args",
+                                           help="Token returned as 'next_cursor' by previous page")
 
@@ -1,15 +1,58 @@
+import itertools
+import json
+import typing
 from http import HTTPStatus
 
 import flask
 
+try:
+    import orjson
+except ImportError:  # Fast JSON backends are optional, standard json is used without them
+    orjson = None
 
-def _create_common_response(data, status: int, status_text: str):
+try:
+    import ujson
+    ujson.dumps(None, default=str)  # Only versions supporting `default` can be used
+except (ImportError, TypeError):
+    ujson = None
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_CHUNK_SIZE = 500  # Number of array items encoded at once by streamed responses
+
+_flask_json_encoder = flask.json.JSONEncoder()
+
+
+def _json_default(obj):
+    """ Types unsupported by JSON backend are encoded the same way as by `flask.jsonify` """
+    return _flask_json_encoder.default(obj)
+
+
+def _orjson_dumps(data) -> bytes:
+    # Dates are passed to default, so they are encoded like by the other backends
+    return orjson.dumps(data, default=_json_default,
+                        option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+def _ujson_dumps(data) -> bytes:
+    return ujson.dumps(data, ensure_ascii=False, default=_json_default).encode('utf-8')
+
+
+def _json_dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default).encode('utf-8')
+
+
+# The fastest of available backends: orjson, ujson or standard json
+dumps = _orjson_dumps if orjson is not None else _ujson_dumps if ujson is not None else _json_dumps
+
+
+def _create_common_response(data, status: int, status_text: str, **extra_fields):
     response_dict = {
         'data': data,
         'status': status,
         'status_text': status_text,
+        **extra_fields
     }
-    return flask.jsonify(response_dict)
+    return flask.Response(dumps(response_dict), mimetype='application/json')
 
 
 def create_success_response(data: dict or list, status: int = None, status_text: str = None):
@@ -18,6 +61,65 @@ def create_success_response(data: dict or list, status: int = None, status_text:
                                    status_text=status_text or HTTPStatus.OK.description)
 
 
+def create_paginated_response(data: list, next_cursor: str = None, status: int = None, status_text: str = None):
+    """ Success response with continuation token for the next page (None, if there are no more pages) """
+    return _create_common_response(data=data,
+                                   status=status or HTTPStatus.OK.value,
+                                   status_text=status_text or HTTPStatus.OK.description,
+                                   next_cursor=next_cursor)
+
+
+def _iter_chunks(data: typing.Iterable) -> typing.Iterator[list]:
+    """
+    Split `data` into lists of STREAM_CHUNK_SIZE items. The first chunk is read right away, before response
+    starts, so errors of the first database page are still returned with proper status
+    """
+    items = iter(data)
+    chunk = list(itertools.islice(items, STREAM_CHUNK_SIZE))
+
+    def iter_chunks():
+        nonlocal chunk
+        while chunk:
+            yield chunk
+            chunk = list(itertools.islice(items, STREAM_CHUNK_SIZE))
+
+    return iter_chunks()
+
+
+def create_streamed_response(data: typing.Iterable, status: int = None, status_text: str = None, **extra_fields):
+    """
+    Success response with the same envelope as `create_success_response`, but array `data` is encoded and sent
+    in chunks while it's iterated, so large arrays don't have to be kept in memory
+    """
+    chunks = _iter_chunks(data)
+    envelope = dumps({
+        'status': status or HTTPStatus.OK.value,
+        'status_text': status_text or HTTPStatus.OK.description,
+        **extra_fields
+    })
+
+    def generate():
+        yield b'{"data":['
+        separator = b''
+        for chunk in chunks:
+            yield separator + dumps(chunk)[1:-1]
+            separator = b','
+        yield b'],' + envelope[1:]
+
+    return flask.Response(generate(), mimetype='application/json')
+
+
+def create_ndjson_response(data: typing.Iterable):
+    """ Newline delimited JSON, one item of `data` per line, without envelope. Items are encoded as iterated """
+    chunks = _iter_chunks(data)
+
+    def generate():
+        for chunk in chunks:
+            yield b''.join(dumps(item) + b'\n' for item in chunk)
+
+    return flask.Response(generate(), mimetype=NDJSON_MIMETYPE)
+
+
 def create_success_plain_response(status_text: str = None):
     return flask.Response(status_text or HTTPStatus.NO_CONTENT.description,
                           status=HTTPStatus.NO_CONTENT.value,
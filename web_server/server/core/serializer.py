@@ -7,16 +7,11 @@ import marshmallow.fields as mf
 from marshmallow_pynamodb import ModelSchema
 
 from model.base_model import Model
-from common.util import create_table
 
 
 class Serializer(ModelSchema):
     _api_model = None
 
-    def __init__(self, *args, **kwargs):
-        super(Serializer, self).__init__(*args, **kwargs)
-        create_table(self.model())
-
     @property
     def api_model(self):
         if self._api_model is None:
@@ -34,14 +29,15 @@ class Serializer(ModelSchema):
 
     def _remove_additional_fields(self, data: dict):
         """ Remove fields that aren't provided by user in request """
-        return {k: v for k, v in data.items() if k in self.declared_fields}
+        return {k: v for k, v in data.items() if k in self.fields}
 
     def _get_api_model(self):
         """ Map marshmallow schema into flask_restx api model """
         model_name = self.model().__name__.replace("Model", "")
         rest_attributes = collections.OrderedDict()
         for key, value in self.declared_fields.items():
-            rest_attributes[key] = self.map_marshmallow_field_to_api_field(value)
+            if key in self.fields:  # Excluded fields aren't part of API
+                rest_attributes[key] = self.map_marshmallow_field_to_api_field(value)
         return flask_restx.Model(model_name, rest_attributes)
 
     @classmethod
@@ -72,12 +68,16 @@ class Serializer(ModelSchema):
         raise Exception(f"Cannot map {marshmallow_field} to API model field")
 
 
-def serializer_factory(model_class: t.Type[Model]):
+def serializer_factory(model_class: t.Type[Model], exclude: t.Sequence[str] = ()):
+    """ Create serializer of model, `exclude` are names of internal attributes, which aren't exposed by API """
+    excluded_fields = tuple(exclude)
+
     class _Serializer(Serializer):
         is_removed = mf.Boolean(default=False)
         created_at = mf.Float(allow_none=True)
 
         class Meta:
             model = model_class
+            exclude = excluded_fields
 
     return _Serializer
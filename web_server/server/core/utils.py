@@ -1,16 +1,100 @@
+import base64
+import json
+import re
 import flask
 import typing
+from http import HTTPStatus
 
-from config import PAGE_SIZE
+import flask_restx
+from pynamodb.constants import ATTR_TYPE_MAP
+
+from config import PAGE_SIZE, MAX_PAGE_SIZE
+from core.response_factory import NDJSON_MIMETYPE
+from model.base_model import Model
 from service.base_service import BaseService
 from core.request_arguments_parser import core_request_arguments_parser
 
 
+DURATION_UNITS_IN_MILLISECONDS = {'ms': 1, 's': 1000, 'm': 60 * 1000, 'h': 60 * 60 * 1000, 'd': 24 * 60 * 60 * 1000}
+DURATION_PATTERN = re.compile(r'^(\d+)(ms|s|m|h|d)?$')
+
+
 def add_no_robots_html_header(response: flask.Response):
     response.headers['X-Robots-Tag'] = "noindex, nofollow, noarchive"
     return response
 
 
-def scan_with_pagination(service: typing.Type[BaseService], **kwargs):
+def is_ndjson_requested() -> bool:
+    """ Check if client prefers newline delimited JSON (`Accept: application/x-ndjson`) over JSON """
+    return flask.request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def encode_cursor(last_evaluated_key: typing.Optional[dict]) -> typing.Optional[str]:
+    """ Wrap DynamoDB `last_evaluated_key` into opaque, url-safe continuation token """
+    if not last_evaluated_key:
+        return None
+    serialized_key = json.dumps(last_evaluated_key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(serialized_key).decode('ascii')
+
+
+def _is_valid_key_value(attribute_value, attribute_type: str) -> bool:
+    """ Check, that serialized attribute value of key (e.g. {"N": "42"}) has expected type """
+    if not isinstance(attribute_value, dict) or list(attribute_value) != [attribute_type]:
+        return False
+    value = attribute_value[attribute_type]
+    if not isinstance(value, str) or not value:
+        return False
+    if attribute_type == 'N':
+        try:
+            float(value)
+        except ValueError:
+            return False
+    return True
+
+
+def decode_cursor(cursor: typing.Optional[str], model_class: typing.Type[Model],
+                  hash_key=None) -> typing.Optional[dict]:
+    """
+    Restore DynamoDB `last_evaluated_key` from continuation token created by `encode_cursor`.
+    Token has to hold exactly keys of `model_class` (with value `hash_key` of partition key, if it's given),
+    otherwise DynamoDB would reject it with ValidationException
+    """
+    if not cursor:
+        return None
+    try:
+        last_evaluated_key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        flask_restx.abort(HTTPStatus.BAD_REQUEST, f'Invalid cursor: "{cursor}"')
+    key_attributes = [model_class._hash_key_attribute(), model_class._range_key_attribute()]
+    key_attribute_types = {attribute.attr_name: ATTR_TYPE_MAP[attribute.attr_type]
+                           for attribute in key_attributes if attribute}
+    if (not isinstance(last_evaluated_key, dict) or set(last_evaluated_key) != set(key_attribute_types)
+            or not all(_is_valid_key_value(last_evaluated_key[name], attribute_type)
+                       for name, attribute_type in key_attribute_types.items())):
+        flask_restx.abort(HTTPStatus.BAD_REQUEST, f'Invalid cursor: "{cursor}"')
+    if hash_key is not None:
+        hash_key_attribute = model_class._hash_key_attribute()
+        if last_evaluated_key[hash_key_attribute.attr_name] != {
+                ATTR_TYPE_MAP[hash_key_attribute.attr_type]: hash_key_attribute.serialize(hash_key)}:
+            flask_restx.abort(HTTPStatus.BAD_REQUEST, f'Invalid cursor: "{cursor}"')
+    return last_evaluated_key
+
+
+def scan_with_pagination(service: typing.Type[BaseService], **kwargs) -> typing.Tuple[list, typing.Optional[str]]:
+    """
+    Scan single page of items selected by 'limit' and 'cursor' request arguments.
+    Returns items and cursor of the next page (None, if it was the last one)
+    """
     args = core_request_arguments_parser.parse_args()
-    return service.scan(limit=args.limit or PAGE_SIZE, **kwargs)
+    items, last_evaluated_key = service.scan_page(page_size=max(1, min(args.limit or PAGE_SIZE, MAX_PAGE_SIZE)),
+                                                  last_evaluated_key=decode_cursor(args.cursor, service.model_class),
+                                                  **kwargs)
+    return items, encode_cursor(last_evaluated_key)
+
+
+def parse_duration(duration: str) -> int:
+    """ Convert duration like "500ms", "30s", "5m", "1h" or "1d" (plain number means milliseconds) to milliseconds """
+    match = DURATION_PATTERN.match((duration or '').strip())
+    if not match or int(match.group(1)) == 0:
+        flask_restx.abort(HTTPStatus.BAD_REQUEST, f'Invalid duration: "{duration}"')
+    return int(match.group(1)) * DURATION_UNITS_IN_MILLISECONDS[match.group(2) or 'ms']
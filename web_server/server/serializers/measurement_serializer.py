@@ -2,6 +2,21 @@ from core.serializer import serializer_factory
 from model.measurement_model import MeasurementTypeModel, MeasurementModel
 
 
-MeasurementSerializer = serializer_factory(MeasurementModel)
+# Time bucket (key of time index) and expiration time are internal attributes
+MeasurementSerializer = serializer_factory(MeasurementModel, exclude=('time_bucket', 'expires_at'))
 MeasurementTypeSerializer = serializer_factory(MeasurementTypeModel)
 
+
+def serialize_measurement(measurement: MeasurementModel) -> dict:
+    """
+    Serialize measurement into the same dict as MeasurementSerializer does, but without marshmallow,
+    which takes most of the time of large measurement lists
+    """
+    values = measurement.attribute_values
+    return {
+        'device_id': values.get('device_id'),
+        'measurement_type': values.get('measurement_type'),
+        'timestamp': float(values['timestamp']),
+        'value': float(values['value']),
+        'is_removed': False,
+    }
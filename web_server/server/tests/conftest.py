@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Both server and db_access directories have to be in path (see README)
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, '..', '..', 'db_access')]
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-2')
@@ -0,0 +1,56 @@
+import base64
+import json
+
+import pytest
+import werkzeug.exceptions
+
+from core.utils import encode_cursor, decode_cursor
+from model.device_model import DeviceModel
+from model.measurement_model import MeasurementModel
+
+
+def create_cursor(last_evaluated_key) -> str:
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode('utf-8')).decode('ascii')
+
+
+def test_cursor_is_decoded():
+    last_evaluated_key = {'device_id': {'S': 'device'}, 'timestamp': {'N': '1600000000000'}}
+    assert decode_cursor(encode_cursor(last_evaluated_key), MeasurementModel) == last_evaluated_key
+    assert decode_cursor(encode_cursor(last_evaluated_key), MeasurementModel, 'device') == last_evaluated_key
+    assert decode_cursor(None, MeasurementModel) is None
+
+
+@pytest.mark.parametrize('last_evaluated_key', [
+    {'a': 1},
+    [],
+    {'device_id': {'S': 'device'}},
+    {'device_id': {'S': 'device'}, 'timestamp': {'N': '1'}, 'value': {'N': '2'}},
+    {'device_id': {'S': 'device'}, 'timestamp': {'S': '1'}},
+    {'device_id': {'S': 'device'}, 'timestamp': {'N': 'one'}},
+    {'device_id': {'S': 'device'}, 'timestamp': 1},
+    {'device_id': {'S': 'device', 'N': '1'}, 'timestamp': {'N': '1'}},
+    {'device_id': {'S': 1}, 'timestamp': {'N': '1'}},
+    # Key of other table
+    {'name': {'S': 'temperature'}},
+])
+def test_cursor_with_wrong_keys_is_rejected(last_evaluated_key):
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        decode_cursor(create_cursor(last_evaluated_key), MeasurementModel)
+
+
+def test_cursor_of_other_model_is_rejected():
+    cursor = encode_cursor({'device_id': {'S': 'device'}, 'timestamp': {'N': '1'}})
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        decode_cursor(cursor, DeviceModel)
+
+
+def test_cursor_of_other_partition_is_rejected():
+    cursor = encode_cursor({'device_id': {'S': 'other device'}, 'timestamp': {'N': '1'}})
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        decode_cursor(cursor, MeasurementModel, 'device')
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', base64.urlsafe_b64encode(b'not json').decode('ascii')])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(werkzeug.exceptions.BadRequest):
+        decode_cursor(cursor, DeviceModel)
@@ -4,8 +4,10 @@ import flask
 import flask_restx
 
 from core.utils import scan_with_pagination
+from core.cache import cached, invalidates
+from core.etag import get_etag, create_conditional_response
 from core.request_arguments_parser import core_request_arguments_parser
-from core.response_factory import create_success_response, create_success_plain_response
+from core.response_factory import create_success_response, create_success_plain_response, create_paginated_response
 from serializers.device_serializer import DeviceGroupSerializer
 from service.device_service import DeviceGroupService
 from flask_jwt_extended import jwt_required
@@ -20,16 +22,19 @@ class DeviceGroupAllApi(flask_restx.Resource):
 
     @device_group_namespace.expect(core_request_arguments_parser)
     @device_group_namespace.response(HTTPStatus.OK.real, "List of device groups", [device_group_schema.api_model])
+    @cached('device_group')
     def get(self):
-        """ Returns list of device groups """
-        device_groups = scan_with_pagination(DeviceGroupService)
-        return create_success_response(data=device_group_schema.serialize(device_groups, many=True))
+        """ Returns list of device groups. Follow 'next_cursor' to get next pages """
+        device_groups, next_cursor = scan_with_pagination(DeviceGroupService)
+        return create_conditional_response(get_etag(device_groups), lambda: create_paginated_response(
+            data=device_group_schema.serialize(device_groups, many=True), next_cursor=next_cursor))
 
     @device_group_namespace.expect(device_group_schema.api_model)
     @device_group_namespace.response(HTTPStatus.CREATED.real,
                                      "Device group was successfully created",
                                      device_group_schema.api_model)
     @jwt_required
+    @invalidates('device_group')
     def post(self):
         """ Create new device """
         device_group_data = device_group_schema.loads_required(flask.request.data)
@@ -41,13 +46,16 @@ class DeviceGroupAllApi(flask_restx.Resource):
 class DeviceGroupSelectedApi(flask_restx.Resource):
 
     @device_group_namespace.response(HTTPStatus.OK.real, "Selected device group", device_group_schema.api_model)
+    @cached('device_group')
     def get(self, hash_key: str):
         """ Returns selected device group """
         device_group = DeviceGroupService.get(hash_key)
-        return create_success_response(data=device_group_schema.serialize(device_group))
+        return create_conditional_response(get_etag(device_group), lambda: create_success_response(
+            data=device_group_schema.serialize(device_group)))
 
     @device_group_namespace.response(HTTPStatus.NO_CONTENT.real, "Device group was successfully removed")
     @jwt_required
+    @invalidates('device_group')
     def delete(self, hash_key: str):
         """ Remove selected device group """
         device_group = DeviceGroupService.get(hash_key)
@@ -57,6 +65,7 @@ class DeviceGroupSelectedApi(flask_restx.Resource):
     @device_group_namespace.expect(device_group_schema.api_model)
     @device_group_namespace.response(HTTPStatus.OK.real, "Edited device group", device_group_schema.api_model)
     @jwt_required
+    @invalidates('device_group')
     def put(self, hash_key: str):
         """ Edit selected device group """
         device_group_data = device_group_schema.loads_required(flask.request.data)
@@ -4,8 +4,10 @@ import flask
 import flask_restx
 
 from core.utils import scan_with_pagination
+from core.cache import cached, invalidates
+from core.etag import get_etag, create_conditional_response
 from core.request_arguments_parser import core_request_arguments_parser
-from core.response_factory import create_success_response, create_success_plain_response
+from core.response_factory import create_success_response, create_success_plain_response, create_paginated_response
 from serializers.device_serializer import DeviceTypeSerializer
 from service.device_service import DeviceTypeService
 from flask_jwt_extended import jwt_required
@@ -20,16 +22,19 @@ class DeviceTypeAllApi(flask_restx.Resource):
 
     @device_type_namespace.expect(core_request_arguments_parser)
     @device_type_namespace.response(HTTPStatus.OK.real, "List of device types", [device_type_schema.api_model])
+    @cached('device_type')
     def get(self):
-        """ Returns list of device types """
-        device_types = scan_with_pagination(DeviceTypeService)
-        return create_success_response(data=device_type_schema.serialize(device_types, many=True))
+        """ Returns list of device types. Follow 'next_cursor' to get next pages """
+        device_types, next_cursor = scan_with_pagination(DeviceTypeService)
+        return create_conditional_response(get_etag(device_types), lambda: create_paginated_response(
+            data=device_type_schema.serialize(device_types, many=True), next_cursor=next_cursor))
 
     @device_type_namespace.expect(device_type_schema.api_model)
     @device_type_namespace.response(HTTPStatus.CREATED.real,
                                     "Device type was successfully created",
                                     device_type_schema.api_model)
     @jwt_required
+    @invalidates('device_type')
     def post(self):
         """ Create new device """
         device_type_data = device_type_schema.loads_required(flask.request.data)
@@ -41,13 +46,16 @@ class DeviceTypeAllApi(flask_restx.Resource):
 class DeviceTypeSelectedApi(flask_restx.Resource):
 
     @device_type_namespace.response(HTTPStatus.OK.real, "Selected device type", device_type_schema.api_model)
+    @cached('device_type')
     def get(self, hash_key: str):
         """ Returns selected device type """
         device_type = DeviceTypeService.get(hash_key)
-        return create_success_response(data=device_type_schema.serialize(device_type))
+        return create_conditional_response(get_etag(device_type), lambda: create_success_response(
+            data=device_type_schema.serialize(device_type)))
 
     @device_type_namespace.response(HTTPStatus.NO_CONTENT.real, "Device type was successfully removed")
     @jwt_required
+    @invalidates('device_type')
     def delete(self, hash_key: str):
         """ Remove selected device type """
         device_type = DeviceTypeService.get(hash_key)
@@ -57,6 +65,7 @@ class DeviceTypeSelectedApi(flask_restx.Resource):
     @device_type_namespace.expect(device_type_schema.api_model)
     @device_type_namespace.response(HTTPStatus.OK.real, "Edited device type", device_type_schema.api_model)
     @jwt_required
+    @invalidates('device_type')
     def put(self, hash_key: str):
         """ Edit selected device type """
         device_type_data = device_type_schema.loads_required(flask.request.data)
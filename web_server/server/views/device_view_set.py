@@ -9,6 +9,8 @@ import botocore.exceptions
 from core.things_helper import create_thing, get_thing_certificates
 from core.utils import scan_with_pagination
 from core.response_factory import *
+from core.cache import cached, invalidates
+from core.etag import get_etag, create_conditional_response
 from core.request_arguments_parser import core_request_arguments_parser
 from serializers.device_serializer import DeviceSerializer
 from service.device_service import DeviceService
@@ -27,14 +29,17 @@ class DeviceAllApi(flask_restx.Resource):
 
     @device_namespace.expect(core_request_arguments_parser)
     @device_namespace.response(HTTPStatus.OK.real, "List of devices", [device_schema.api_model])
+    @cached('device')
     def get(self):
-        """ Returns list of devices """
-        devices = scan_with_pagination(DeviceService)
-        return create_success_response(data=device_schema.serialize(devices, many=True))
+        """ Returns list of devices. Follow 'next_cursor' to get next pages """
+        devices, next_cursor = scan_with_pagination(DeviceService)
+        return create_conditional_response(get_etag(devices), lambda: create_paginated_response(
+            data=device_schema.serialize(devices, many=True), next_cursor=next_cursor))
 
     @device_namespace.expect(device_schema.api_model)
     @device_namespace.response(HTTPStatus.CREATED.real, "Device and thing was successfully created", device_schema.api_model)
     @jwt_required
+    @invalidates('device', 'device_group', 'device_type')  # Missing group and type of device are created too
     def post(self):
         """ Create new device and new thing """
         device_data = device_schema.loads_required(flask.request.data)
@@ -52,13 +57,16 @@ class DeviceAllApi(flask_restx.Resource):
 class DeviceSelectedApi(flask_restx.Resource):
 
     @device_namespace.response(HTTPStatus.OK.real, "Selected device", device_schema.api_model)
+    @cached('device')
     def get(self, hash_key: str):
         """ Returns selected device """
         device = DeviceService.get(hash_key)
-        return create_success_response(data=device_schema.serialize(device))
+        return create_conditional_response(get_etag(device), lambda: create_success_response(
+            data=device_schema.serialize(device)))
 
     @device_namespace.response(HTTPStatus.NO_CONTENT.real, "Device was successfully removed")
     @jwt_required
+    @invalidates('device')
     def delete(self, hash_key: str):
         """ Remove selected device """
         device = DeviceService.get(hash_key)
@@ -68,6 +76,7 @@ class DeviceSelectedApi(flask_restx.Resource):
     @device_namespace.expect(device_schema.api_model)
     @device_namespace.response(HTTPStatus.NO_CONTENT.real, "Device was successfully edited")
     @jwt_required
+    @invalidates('device')
     def put(self, hash_key: str):
         """ Edit selected device """
         device_data = device_schema.loads_required(flask.request.data)
@@ -4,8 +4,10 @@ import flask
 import flask_restx
 
 from core.utils import scan_with_pagination
+from core.cache import cached, invalidates
+from core.etag import get_etag, create_conditional_response
 from core.request_arguments_parser import core_request_arguments_parser
-from core.response_factory import create_success_response, create_success_plain_response
+from core.response_factory import create_success_response, create_success_plain_response, create_paginated_response
 from serializers.measurement_serializer import MeasurementTypeSerializer
 from service.measurement_service import MeasurementTypeService
 
@@ -22,15 +24,18 @@ class MeasurementTypeAllApi(flask_restx.Resource):
     @measurement_type_namespace.response(HTTPStatus.OK.real,
                                          "List of measurement types",
                                          [measurement_type_schema.api_model])
+    @cached('measurement_type')
     def get(self):
-        """ Returns list of measurement types """
-        measurement_types = scan_with_pagination(MeasurementTypeService)
-        return create_success_response(data=measurement_type_schema.serialize(measurement_types, many=True))
+        """ Returns list of measurement types. Follow 'next_cursor' to get next pages """
+        measurement_types, next_cursor = scan_with_pagination(MeasurementTypeService)
+        return create_conditional_response(get_etag(measurement_types), lambda: create_paginated_response(
+            data=measurement_type_schema.serialize(measurement_types, many=True), next_cursor=next_cursor))
 
     @measurement_type_namespace.expect(measurement_type_schema.api_model)
     @measurement_type_namespace.response(HTTPStatus.CREATED.real,
                                          "Measurement type was successfully created",
                                          measurement_type_schema.api_model)
+    @invalidates('measurement_type')
     def post(self):
         """ Create new measurement type """
         measurement_type_data = measurement_type_schema.loads_required(flask.request.data)
@@ -43,12 +48,15 @@ class DeviceSelectedApi(flask_restx.Resource):
 
     @measurement_type_namespace.response(HTTPStatus.OK.real,
                                          "Selected measurement type", measurement_type_schema.api_model)
+    @cached('measurement_type')
     def get(self, hash_key: str):
         """ Returns selected measurement type """
         measurement_type = MeasurementTypeService.get(hash_key)
-        return create_success_response(data=measurement_type_schema.serialize(measurement_type))
+        return create_conditional_response(get_etag(measurement_type), lambda: create_success_response(
+            data=measurement_type_schema.serialize(measurement_type)))
 
     @measurement_type_namespace.response(HTTPStatus.NO_CONTENT.real, "Measurement type was successfully removed")
+    @invalidates('measurement_type')
     def delete(self, hash_key: str):
         """ Remove selected measurement type """
         measurement_type = MeasurementTypeService.get(hash_key)
@@ -59,6 +67,7 @@ class DeviceSelectedApi(flask_restx.Resource):
     @measurement_type_namespace.response(HTTPStatus.OK.real,
                                          "Edited measurement type",
                                          measurement_type_schema.api_model)
+    @invalidates('measurement_type')
     def put(self, hash_key: str):
         """ Edit selected measurement type """
         measurement_type_data = measurement_type_schema.loads_required(flask.request.data)
@@ -4,11 +4,16 @@ import time
 import flask
 import flask_restx
 
-from core.response_factory import create_success_response, create_success_plain_response
-from serializers.measurement_serializer import MeasurementSerializer
+import config
+from core.cache import invalidates
+from core.response_factory import create_success_response, create_success_plain_response, create_paginated_response, \
+    create_streamed_response, create_ndjson_response
+from core.utils import encode_cursor, decode_cursor, parse_duration, is_ndjson_requested
+from serializers.measurement_serializer import MeasurementSerializer, serialize_measurement
 from service.measurement_service import MeasurementService
+from view.measurement_view import MeasurementView, AGGREGATION_FUNCTIONS
 
-FOUR_HOURS_IN_SECONDS = 60 * 60 * 4
+FOUR_HOURS_IN_MILLISECONDS = 1000 * 60 * 60 * 4
 
 measurement_schema = MeasurementSerializer()
 measurement_namespace = flask_restx.Namespace("Measurement")
@@ -18,6 +23,20 @@ measurement_timestamp_parser = flask_restx.reqparse.RequestParser()
 measurement_timestamp_parser.add_argument('minTimestamp', help="Minimum Read Datetime Default is last 4 hours. ", type=float)
 measurement_timestamp_parser.add_argument('maxTimestamp', help="Maximum Read Datetime. Default is now. ", type=float)
 
+measurement_page_parser = measurement_timestamp_parser.copy()
+measurement_page_parser.add_argument('limit', help=f"Page size, at most {config.MEASUREMENT_PAGE_SIZE}", type=int)
+measurement_page_parser.add_argument('cursor', help="Token returned as 'next_cursor' by previous page", type=str)
+
+measurement_aggregate_parser = measurement_timestamp_parser.copy()
+measurement_aggregate_parser.add_argument('bucket', help="Width of time bucket, e.g. 30s, 5m, 1h, 1d", type=str,
+                                          default='5m')
+measurement_aggregate_parser.add_argument('fn', help=f"Comma separated functions: {', '.join(AGGREGATION_FUNCTIONS)}",
+                                          type=str, default='avg')
+measurement_aggregate_parser.add_argument('measurement_type', help="Aggregate only measurements of this type",
+                                          type=str)
+measurement_aggregate_parser.add_argument('points', help="Instead of aggregating, downsample measurements of selected "
+                                                         "type with LTTB to at most this number of points", type=int)
+
 
 @measurement_namespace.route('/')
 class MeasurementAllApi(flask_restx.Resource):
@@ -25,18 +44,23 @@ class MeasurementAllApi(flask_restx.Resource):
     @measurement_namespace.expect(measurement_timestamp_parser)
     @measurement_namespace.response(HTTPStatus.OK.real, "List of measurement", [measurement_schema.api_model])
     def get(self):
-        """ Returns list of measurement types """
-        MeasurementModel = MeasurementService.model_class
+        """
+        Returns list of measurements of all devices from selected time range, oldest first.
+        With 'Accept: application/x-ndjson' measurements are streamed one per line instead
+        """
         measurement_timestamp_options = measurement_timestamp_parser.parse_args()
-        min_timestamp = measurement_timestamp_options.minTimestamp or time.time() * 1000 - FOUR_HOURS_IN_SECONDS
+        min_timestamp = measurement_timestamp_options.minTimestamp or time.time() * 1000 - FOUR_HOURS_IN_MILLISECONDS
         max_timestamp = measurement_timestamp_options.maxTimestamp or time.time() * 1000
-        measurements = MeasurementService.scan(filter_condition=(MeasurementModel.timestamp > min_timestamp) & (MeasurementModel.timestamp < max_timestamp))
-        return create_success_response(data=measurement_schema.serialize(measurements, many=True))
+        measurements = MeasurementService.iter_measurements_for_time_range(min_timestamp, max_timestamp)
+        if is_ndjson_requested():
+            return create_ndjson_response(data=map(serialize_measurement, measurements))
+        return create_streamed_response(data=map(serialize_measurement, measurements))
 
     @measurement_namespace.expect(measurement_schema.api_model)
     @measurement_namespace.response(HTTPStatus.CREATED.real,
                                     "Measurement was successfully created",
                                     measurement_schema.api_model)
+    @invalidates('measurement_type')  # Type of measurement is created, if it doesn't exist yet
     def post(self):
         """ Create new measurement """
         measurement_data = measurement_schema.loads_required(flask.request.data)
@@ -47,18 +71,73 @@ class MeasurementAllApi(flask_restx.Resource):
 @measurement_namespace.route('/<hash_key>/')
 class DeviceMeasurementAllApi(flask_restx.Resource):
 
-    @measurement_namespace.expect(measurement_timestamp_parser)
+    @measurement_namespace.expect(measurement_page_parser)
     @measurement_namespace.response(HTTPStatus.OK.real, "List of measurement", [measurement_schema.api_model])
     def get(self, hash_key: str):
-        """ Returns measurement of selected device """
-        MeasurementModel = MeasurementService.model_class
-        measurement_timestamp_options = measurement_timestamp_parser.parse_args()
-        min_timestamp = measurement_timestamp_options.minTimestamp or time.time() * 1000 - FOUR_HOURS_IN_SECONDS
-        max_timestamp = measurement_timestamp_options.maxTimestamp or time.time() * 1000
-        measurements = MeasurementService.scan(filter_condition=((MeasurementModel.device_id == hash_key) &
-                                               (MeasurementModel.timestamp > min_timestamp) &
-                                               (MeasurementModel.timestamp < max_timestamp))) # TODO: Change to query
-        return create_success_response(data=measurement_schema.serialize(measurements, many=True))
+        """
+        Returns measurement of selected device, oldest first. Follow 'next_cursor' to get next pages.
+        With 'Accept: application/x-ndjson' all measurements (at most 'limit') from 'cursor' on
+        are streamed one per line instead
+        """
+        measurement_page_options = measurement_page_parser.parse_args()
+        min_timestamp = measurement_page_options.minTimestamp or time.time() * 1000 - FOUR_HOURS_IN_MILLISECONDS
+        max_timestamp = measurement_page_options.maxTimestamp or time.time() * 1000
+        start_key = decode_cursor(measurement_page_options.cursor, MeasurementService.model_class, hash_key)
+        if is_ndjson_requested():
+            measurements = MeasurementService.iter_measurements_for_device(
+                hash_key, min_timestamp, max_timestamp, limit=measurement_page_options.limit,
+                last_evaluated_key=start_key)
+            return create_ndjson_response(data=map(serialize_measurement, measurements))
+        page_size = max(1, min(measurement_page_options.limit or config.MEASUREMENT_PAGE_SIZE,
+                               config.MEASUREMENT_PAGE_SIZE))
+        measurements, last_evaluated_key = MeasurementService.query_page(
+            hash_key=hash_key,
+            range_key_condition=MeasurementService.model_class.timestamp.between(min_timestamp, max_timestamp),
+            page_size=page_size,
+            last_evaluated_key=start_key)
+        return create_paginated_response(data=[serialize_measurement(measurement) for measurement in measurements],
+                                         next_cursor=encode_cursor(last_evaluated_key))
+
+
+@measurement_namespace.route('/<hash_key>/aggregate')
+class DeviceMeasurementAggregateApi(flask_restx.Resource):
+
+    @measurement_namespace.expect(measurement_aggregate_parser)
+    @measurement_namespace.response(HTTPStatus.OK.real, "List of aggregated measurements")
+    def get(self, hash_key: str):
+        """
+        Returns measurements of selected device aggregated into time buckets, oldest first.
+        With 'points' returns measurements of selected type downsampled for charts instead.
+        With 'Accept: application/x-ndjson' rows are streamed one per line
+        """
+        measurement_aggregate_options = measurement_aggregate_parser.parse_args()
+        min_timestamp = measurement_aggregate_options.minTimestamp or time.time() * 1000 - FOUR_HOURS_IN_MILLISECONDS
+        max_timestamp = measurement_aggregate_options.maxTimestamp or time.time() * 1000
+        measurement_type = measurement_aggregate_options.measurement_type
+        create_response = create_ndjson_response if is_ndjson_requested() else create_streamed_response
+
+        if measurement_aggregate_options.points is not None:
+            if not measurement_type:
+                flask_restx.abort(HTTPStatus.BAD_REQUEST, "Downsampling requires 'measurement_type'")
+            if not 2 < measurement_aggregate_options.points <= config.MAX_AGGREGATION_BUCKETS:
+                flask_restx.abort(HTTPStatus.BAD_REQUEST,
+                                  f"'points' has to be between 3 and {config.MAX_AGGREGATION_BUCKETS}")
+            measurements = MeasurementView.iter_downsampled_measurements(
+                hash_key, min_timestamp, max_timestamp, measurement_aggregate_options.points, measurement_type)
+            return create_response(data=measurements)
+
+        bucket_size = parse_duration(measurement_aggregate_options.bucket)
+        if (max_timestamp - min_timestamp) / bucket_size > config.MAX_AGGREGATION_BUCKETS:
+            flask_restx.abort(HTTPStatus.BAD_REQUEST, f"Time range can be divided into at most "
+                                                      f"{config.MAX_AGGREGATION_BUCKETS} buckets, select larger bucket")
+        functions = [function.strip() for function in measurement_aggregate_options.fn.split(',') if function.strip()]
+        unknown_functions = set(functions) - set(AGGREGATION_FUNCTIONS)
+        if not functions or unknown_functions:
+            flask_restx.abort(HTTPStatus.BAD_REQUEST,
+                              f"Functions have to be selected from: {', '.join(AGGREGATION_FUNCTIONS)}")
+        measurements = MeasurementView.iter_aggregated_measurements(
+            hash_key, min_timestamp, max_timestamp, bucket_size, functions, measurement_type)
+        return create_response(data=measurements)
 
 
 @measurement_namespace.route('/<hash_key>/<range_key>')